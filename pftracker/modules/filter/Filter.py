@@ -6,9 +6,8 @@ by a model class.
 """
 
 import numpy as np
-from numpy.random import random
-from filterpy.monte_carlo import multinomial_resample, stratified_resample, systematic_resample
-from pftracker.modules.filter.pfAlgorithms import pfiltering
+from pftracker.modules.filter.pfAlgorithms import pfiltering, log_normalize
+from pftracker.modules.filter.resampling import Resampler
 
 class ParticleFilter():
     """
@@ -19,9 +18,11 @@ class ParticleFilter():
     model where to apply particle filter estimations. This model methods are:
         - initialization: Create initial particles distribution.
         - prediction: Predict next state of the particles.
-        - update: Evaluate predicted particles with an observation model.
+        - update: Evaluate predicted particles with an observation model,
+          returning their log-likelihoods.
         - update_apf: Evaluate predicted particles for second stage weights in
-          auxiliary particle filter algorithm.  
+          auxiliary particle filter algorithm, returning their 
+          log-likelihoods.
         - visualize: Visualize the estimate resulting from particle filter 
           algorithm.
         - saveEstimation: Save particle filter estimates into a .txt file.
@@ -45,9 +46,13 @@ class ParticleFilter():
         resamplePercent (int): Resampling percent 
         robustPercent (int, optional): Particles percent to use in the robust 
             mean estimation algorithm.
+        rng (numpy.random.Generator, optional): random number generator of
+            the resampling step. Default is None, a generator seeded from 
+            the global numpy random state
     """
     
-    def __init__(self, model, algorithm, N, output, resample, resamplePercent, robustPercent=None): 
+    def __init__(self, model, algorithm, N, output, resample, resamplePercent, robustPercent=None,
+                 rng=None): 
         self.model = model
         self.N = N   
         
@@ -61,6 +66,7 @@ class ParticleFilter():
         if robustPercent != None: 
             self.N_robust = round(robustPercent * self.N/100)
         self.estimation = None       
+        self.resampler = Resampler(self.N, rng)
         self.pfiltering = pfiltering(self.N)
 
     def initialization(self):
@@ -104,12 +110,12 @@ class ParticleFilter():
         This function is depedent on the model class.
         
         Returns:
-            (array) of likelihoods of predicted particles x_{k},
-            with (1, N) dimension. This is p(z_{k}|x_{k}).
+            (array) of log-likelihoods of predicted particles x_{k},
+            with (1, N) dimension. This is log p(z_{k}|x_{k}).
         """
         
-        likelihoods = self.model.update(particles)
-        return likelihoods
+        log_likelihoods = self.model.update(particles)
+        return log_likelihoods
     
     def update_apf(self, particles):   
         """Evaluate predicted particles x_{k}^{idx} with an observation model.
@@ -127,12 +133,12 @@ class ParticleFilter():
                 (state_vector_size, N) dimension
 
         Returns:
-            (array) of likelihoods of particles x_{k}^{idx},
-            with (1, N) dimension. This is p(z_{k}|x_{k}^{idx}).
+            (array) of log-likelihoods of particles x_{k}^{idx},
+            with (1, N) dimension. This is log p(z_{k}|x_{k}^{idx}).
         """
         
-        likelihoods = self.model.update_apf(particles)
-        return likelihoods
+        log_likelihoods = self.model.update_apf(particles)
+        return log_likelihoods
     
     def filtering(self, pf, particles):
         """Runs particle filter algorithm.
@@ -173,67 +179,35 @@ class ParticleFilter():
             weights (array): particle weigths after update process
             
         Returns:
-            (array) of indixes resulting from resampling with (1,N) dimension 
+            (array) of int32 indixes resulting from resampling with (N,) 
+            dimension 
         """        
-        def residual_resample(weights):
-            """ This was taken from filterpy package and some changes were made.
-            
-            Performs the residual resampling algorithm used by particle filters.
-        
-            For more documentation see https://filterpy.readthedocs.org
-            """
-            N = len(weights)
-            indexes = np.zeros(N, 'i')    
-        
-            # take int(N*w) copies of each weight, which ensures particles with the
-            # same weight are drawn uniformly
-            num_copies = (np.floor(N*np.asarray(weights))).astype(int)
-        #    num_copies = (N*np.asarray(weights)).astype(int)
-        #    scaled_weights = N*np.asarray(weights)
-            
-            k = 0
-            for i in range(N):
-                # change done here in num_copies[i][0]
-                for _ in range(np.array(num_copies[i][0])): # make n copies
-                    indexes[k] = i
-                    k += 1
-        
-            # use multinormal resample on the residual to fill up the rest. This
-            # maximizes the variance of the samples
-            residual = weights - num_copies     # get fractional part
-        #    residual = scaled_weights - num_copies
-            residual /= sum(residual)           # normalize
-            cumulative_sum = np.cumsum(residual)
-            cumulative_sum[-1] = 1. # avoid round-off errors: ensures sum is exactly one
-            indexes[k:N] = np.searchsorted(cumulative_sum, random(N-k))
-        
-            return indexes
         
         if self.arg_resample == "systematic":
-            indixes = systematic_resample(weights)
+            indixes = self.resampler.systematic(weights)
         elif self.arg_resample == "stratified":
-            indixes = stratified_resample(weights)
+            indixes = self.resampler.stratified(weights)
         elif self.arg_resample == "residual":
-            indixes = residual_resample(weights)
+            indixes = self.resampler.residual(weights)
         elif self.arg_resample == "multinomial":
-            indixes = multinomial_resample(weights)
+            indixes = self.resampler.multinomial(weights)
         return indixes
            
-    def estimate(self, particles, weights): 
+    def estimate(self, particles, log_weights): 
         """Returns the expected particle filter estimation.
         
         Args:
             particles: predicted particles x_{k}
-            weights: particle weigths after update process
+            log_weights: normalized particle log weigths after update process
         """
         
         if self.arg_output ==  "weighted_mean":
             # Calculate weighted mean estimate
-            self.estimation = np.sum(particles * weights, axis=1)
+            self.estimation = np.sum(particles * np.exp(log_weights), axis=1)
                     
         elif self.arg_output == "MAP":  
             # Calculate maximum weight
-            idx = np.argmax(weights, axis=1)
+            idx = np.argmax(log_weights, axis=1)
             self.estimation = particles[:, idx]
             self.estimation = self.estimation.reshape((6,))                 
                     
@@ -241,13 +215,13 @@ class ParticleFilter():
             # Calculate robust mean estimate 
                                  
             # sort weights in descendent order
-            weights_sort = -np.sort(-weights) 
+            weights_sort = -np.sort(-log_weights) 
             
             # get index of sorted weights
-            idx_sort = np.argsort(-weights) 
+            idx_sort = np.argsort(-log_weights) 
             
             # normalize sorted weights
-            weights_norm = weights_sort[0, :self.N_robust] / np.sum(weights_sort[0, :self.N_robust])
+            weights_norm = np.exp(log_normalize(weights_sort[0, :self.N_robust]))
             
             # sort particles by weight
             particles_sort = particles[:, idx_sort[0, :self.N_robust]]
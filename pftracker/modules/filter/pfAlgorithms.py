@@ -5,12 +5,54 @@ an estimation problem.
 
 All particle filters estimate in a two-stage process: prediction and update. 
 
+Weights are kept in log domain and normalized with the log-sum-exp trick, 
+so they do not underflow to zero with many particles or sharp likelihoods.
+
 @author: Bessie Domínguez-Dáger
 """
 
 import numpy as np
 from filterpy.kalman import KalmanFilter
 
+def logsumexp(a):
+    """Calculate log(sum(exp(a))) without overflow or underflow.
+    
+    Args:
+        a (array): values in log domain
+        
+    Returns:
+        (float) log of the sum of the exponentials of a, -inf if all the 
+        values are -inf
+    """
+    
+    a_max = np.max(a)
+    if not np.isfinite(a_max):
+        return a_max
+    return a_max + np.log(np.sum(np.exp(a - a_max)))
+
+def log_normalize(log_w):
+    """Normalize weights in log domain.
+    
+    Undefined (NaN) weights are taken as zero (-inf in log domain), and 
+    infinite weights share all the probability. If all the weights are 
+    zero uniform weights are returned.
+    
+    Args:
+        log_w (array): unnormalized log weights with (1,N) dimension
+        
+    Returns:
+        (array) of normalized log weights with (1,N) dimension 
+    """
+    
+    log_w = np.where(np.isnan(log_w), -np.inf, log_w)
+    if np.any(np.isposinf(log_w)):
+        log_w = np.where(np.isposinf(log_w), 0., -np.inf)
+    
+    log_sum = logsumexp(log_w)
+    if np.isneginf(log_sum):
+        return np.full(log_w.shape, -np.log(log_w.size))
+    return log_w - log_sum
+
 class pfiltering():
     """Particle filter algorithms.
     
@@ -23,16 +65,24 @@ class pfiltering():
         - G_PF: Generic particle filter
         - APF: Auxilliary particle filter
     
+    The particle weights are kept in log domain in log_w, the weights
+    in linear domain are given by w.
+    
     Args:
         N (int): Number of particles 
     """
     def __init__(self, N):
         self.N = N
         
-        # Initialize weights
-        self.w = np.ones((1,N)) / N       # weights are uniform at first
+        # Initialize log weights
+        self.log_w = np.full((1,N), -np.log(N))  # weights are uniform at first
         self.i = 0
         
+    @property
+    def w(self):
+        """(array) normalized weights with (1,N) dimension."""
+        return np.exp(self.log_w)
+        
     def neff(self):
         """
         Calculate the number of effective particles.
@@ -40,7 +90,7 @@ class pfiltering():
         Returns:
             (float) number of effective particles
         """
-        return 1. / np.sum(np.square(self.w))
+        return np.exp(-logsumexp(2 * self.log_w))
      
     def resample_from_index(self, particles, indexes):
         """Returns resampled particles according to indexes.
@@ -52,8 +102,7 @@ class pfiltering():
                 with (1,N) dimension 
         """
         particles[:, :] = particles[:,indexes]
-        self.w[0,:] = self.w[0,indexes]
-        self.w.fill(1.0 / len(self.w))
+        self.log_w.fill(-np.log(self.N))
         return particles
     
     def kalman_filter(self, particles_0):
@@ -180,17 +229,14 @@ class pfiltering():
         # prediction step
         particles, _ = pf.prediction(particles) 
         
-        # update step
-        likelihood  = pf.update(particles)  
+        # update step, log p(z_{k}|x_{k})
+        log_likelihood  = pf.update(particles)  
         
-        # calculate weights
-        self.w = self.w * likelihood
-        
-        # normalize weights
-        self.w /= np.sum(self.w)    
+        # calculate and normalize log weights
+        self.log_w = log_normalize(self.log_w + log_likelihood)
          
         # estimate step
-        pf.estimate(particles, self.w)
+        pf.estimate(particles, self.log_w)
 
         return particles
         
@@ -279,18 +325,15 @@ class pfiltering():
         # calculate u_{k} from p(x_{k}|x_{k-1})
         uk = self.calc_uk_with_kf(pf, particles)
         
-        # calculate likelihood for u_{k}, this is p(z_{k}|u_{k})
-        likelihood_uk = pf.update(uk)        
+        # calculate log-likelihood for u_{k}, this is log p(z_{k}|u_{k})
+        log_likelihood_uk = pf.update(uk)        
                            
-        # calculate first stage weights w_{k}^{i} with u_{k}^{i}
-        w1 = self.w * likelihood_uk
-#        w1 = self.w * likelihood_uk + 1e-7
-            
-        # normalize weights
-        w1 /= np.sum(w1)              
+        # calculate and normalize first stage log weights w_{k}^{i} with 
+        # u_{k}^{i}
+        log_w1 = log_normalize(self.log_w + log_likelihood_uk)
             
         # resample from first stage weights
-        indexes =  pf.resample(w1.T)
+        indexes =  pf.resample(np.exp(log_w1).T)
             
         # get particles x_{k-1}^{idx}  
         particles[:, :] = particles[:, indexes]
@@ -298,24 +341,20 @@ class pfiltering():
         # prediction step, move particles from x_{k-1}^{idx} to x_{k}
         particles, _ = pf.prediction(particles)
             
-        # update step, p(z_{k}|x_{k}^{idx})
-        likelihood_xk  = pf.update_apf(particles)
+        # update step, log p(z_{k}|x_{k}^{idx})
+        log_likelihood_xk  = pf.update_apf(particles)
             
-        # calculate second stage weights,
-        # w = p(z_{k}|x_{k}^{idx}) / p(z_{k}|u-{k})
-        for i in range(self.N):
-            if w1[:,i] == 0:
-                self.w[:,i] = self.N 
-#                self.w[:,i] = self.w[:,i] + 1e-7
-            else:
-                self.w[:,i] = likelihood_xk[:,i] / likelihood_uk[:,i] 
-        
-#        self.w = likelihood_xk / likelihood_uk
+        # calculate second stage log weights,
+        # w = p(z_{k}|x_{k}^{idx}) / p(z_{k}|u-{k}), the particles with zero
+        # first stage weight take weight N
+        with np.errstate(invalid='ignore'):
+            log_w = np.where(np.isneginf(log_w1), np.log(self.N), 
+                             log_likelihood_xk - log_likelihood_uk)
             
-        # normalize weights
-        self.w /= np.sum(self.w)    
+        # normalize log weights
+        self.log_w = log_normalize(log_w)
                       
         # estimate step
-        pf.estimate(particles, self.w)
+        pf.estimate(particles, self.log_w)
        
         return particles
\ No newline at end of file
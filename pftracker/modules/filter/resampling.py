@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+This module implements the resampling schemes used by the particle filter 
+algorithms.
+
+@author: Bessie Domínguez-Dáger
+"""
+
+import numpy as np
+
+class Resampler():
+    """Resampling schemes with preallocated buffers.
+    
+    The cumulative sum of the weights and the resulting indexes are written 
+    into buffers reused in each call, so resampling does not allocate new 
+    arrays each frame. Random numbers are drawn from the resampler own 
+    generator, so independent filters do not share the random state.
+    
+    Supported resampling schemes:
+        - systematic
+        - stratified
+        - residual
+        - multinomial
+    
+    All of them take the normalized weights with (N,) or (N,1) dimension
+    and return the int32 indexes of the resampled particles with (N,)
+    dimension. The returned array is the index buffer, which is overwritten
+    by the next call.
+    
+    Args:
+        N (int): Number of particles 
+        rng (numpy.random.Generator, optional): random number generator. 
+            Default is None, a generator seeded from the global numpy random
+            state, so seeded runs are reproducible
+    """
+    def __init__(self, N, rng=None):
+        self.N = N
+        if rng is None:
+            rng = np.random.default_rng(np.random.randint(2**31))
+        self.rng = rng
+        
+        # buffers reused across frames
+        self.cumulative_sum = np.empty(N)
+        self.positions = np.empty(N)
+        self.indexes = np.empty(N, dtype=np.int32)
+        self.num_copies = np.empty(N, dtype=np.int64)
+        
+    def cumsum(self, weights):
+        """Cumulative sum of the weights, ending exactly at one.
+        
+        Args:
+            weights (array): normalized particle weights
+        """
+        np.cumsum(np.asarray(weights).ravel(), out=self.cumulative_sum)
+        self.cumulative_sum[-1] = 1.   # avoid round-off errors
+        return self.cumulative_sum
+    
+    def search(self, positions, out):
+        """Index of the particle of each position in [0, 1).
+        
+        Args:
+            positions (array): sorted or unsorted positions in [0, 1)
+            out (array): array where the indexes are written
+        """
+        out[:] = np.searchsorted(self.cumulative_sum, positions, side='right')
+        np.minimum(out, self.N - 1, out=out)
+        return out
+        
+    def systematic(self, weights):
+        """Systematic resampling, a single random offset for N evenly 
+        spaced positions.
+        
+        Args:
+            weights (array): normalized particle weights
+        """
+        self.cumsum(weights)
+        positions = self.positions
+        positions[:] = np.arange(self.N)
+        positions += self.rng.random()
+        positions /= self.N
+        return self.search(positions, self.indexes)
+    
+    def stratified(self, weights):
+        """Stratified resampling, a random position in each of N equal 
+        strata.
+        
+        Args:
+            weights (array): normalized particle weights
+        """
+        self.cumsum(weights)
+        positions = self.positions
+        self.rng.random(out=positions)
+        positions += np.arange(self.N)
+        positions /= self.N
+        return self.search(positions, self.indexes)
+    
+    def multinomial(self, weights):
+        """Multinomial resampling, N independent random positions.
+        
+        Args:
+            weights (array): normalized particle weights
+        """
+        self.cumsum(weights)
+        positions = self.positions
+        self.rng.random(out=positions)
+        return self.search(positions, self.indexes)
+    
+    def residual(self, weights):
+        """Residual resampling, floor(N*w) copies of each particle and 
+        multinomial resampling of the residual weights for the rest.
+        
+        Args:
+            weights (array): normalized particle weights
+        """
+        weights = np.asarray(weights).ravel()
+        
+        # take floor(N*w) copies of each particle
+        scaled = self.positions
+        np.multiply(weights, self.N, out=scaled)
+        num_copies = self.num_copies
+        num_copies[:] = scaled
+        k = num_copies.sum()
+        self.indexes[:k] = np.repeat(np.arange(self.N), num_copies)
+        if k == self.N:
+            return self.indexes
+        
+        # multinomial resampling of the fractional parts for the rest
+        scaled -= num_copies
+        scaled /= scaled.sum()
+        self.cumsum(scaled)
+        self.search(self.rng.random(self.N - k), self.indexes[k:])
+        return self.indexes
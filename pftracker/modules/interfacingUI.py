@@ -14,7 +14,14 @@ from pftracker.modules.models import createMovModel
 
 from pftracker.modules.models import ObsMod
 from pftracker.modules.models.colorhist.HSVModel import hsvModel
+from pftracker.modules.models.colorhist.HSVIntegralModel import hsvIntegralModel
+from pftracker.modules.models.colorhist.HSVBackProjModel import hsvBackProjModel
 from pftracker.modules.models.lbp.LBPModel import lbpModel
+from pftracker.modules.models.lbp.LBPIntegralModel import lbpIntegralModel
+from pftracker.modules.models.hog.HOGModel import hogModel
+from pftracker.modules.models.contour.EllipseModel import ellipseModel
+from pftracker.modules.models.template.TemplateModel import templateModel
+from pftracker.modules.models.multicue.FusedModel import fusedModel
 
 from pftracker.modules.runFilter import RunFilter
    
@@ -39,6 +46,8 @@ class ParticleTracker():
        robustPercent(int): Resampling percent         
        obsmodel(str): Observation model
        stateSpace(str): State space model
+       modelArgs(dict, optional): Keyword arguments of the observation 
+           model, e.g. {"kernel": True, "gridSize": 16}. Default is None
        
     Supported PF algorithms:
         - 'SIS': Sequential Importance Sampling filter
@@ -64,7 +73,20 @@ class ParticleTracker():
     
     Supported observation models: 
         - 'HSV color-based': Color model for weighing the particles  
+        - 'HSV integral histogram': Color model computed with integral 
+          histograms, suitable for large number of particles
+        - 'HSV back-projection': Color model scoring the particles with the 
+          back-projection of the reference histogram, suitable for very 
+          large number of particles
         - 'LBP-based': Texture model for weighing the particles
+        - 'LBP integral histogram': Texture model computed with integral
+          histograms of the frame LBP codes
+        - 'HOG-based': Gradient orientation model computed with integral 
+          histograms, robust to lighting changes
+        - 'Ellipse contour': Head contour model based on the image 
+          gradients on an ellipse
+        - 'Template correlation': Gray face template matched once per frame
+        - 'HSV+LBP fused': Color and texture models evaluated together
                   
     Supported state space models:
         - 'dynamic_bbox': Self updating bounding box model
@@ -74,7 +96,7 @@ class ParticleTracker():
     
     def __init__(self, video, algorithm, n_particles, detector,
                  estimate, resample, resamplePercent, 
-                 robustPercent, obsmodel, stateSpace):            
+                 robustPercent, obsmodel, stateSpace, modelArgs=None):            
         self.video = video
         self.algorithm = algorithm 
         self.n_particles = n_particles 
@@ -85,6 +107,7 @@ class ParticleTracker():
         self.resamplePercent = resamplePercent        
         self.robustPercent = robustPercent        
         self.stateSpace = stateSpace
+        self.modelArgs = modelArgs
             
         if self.resample == "Systematic":
             self.resample = "systematic"
@@ -180,11 +203,39 @@ class ParticleTracker():
         # Observation model initialization ---------------------------                      
         if self.obsmodel == "HSV color-based": 
             # Observation model: HSV histogram
-            obsModel = ObsMod(hsvModel, self.n_particles) 
+            obsModel = ObsMod(hsvModel, self.n_particles, modelArgs=self.modelArgs)
+            
+        elif self.obsmodel == "HSV integral histogram": 
+            # Observation model: HSV histogram from integral histograms
+            obsModel = ObsMod(hsvIntegralModel, self.n_particles, modelArgs=self.modelArgs)
+            
+        elif self.obsmodel == "HSV back-projection": 
+            # Observation model: back-projection of the HSV histogram
+            obsModel = ObsMod(hsvBackProjModel, self.n_particles, modelArgs=self.modelArgs)
             
         elif self.obsmodel == "LBP-based":
             # Observation model: LBP histogram
-            obsModel = ObsMod(lbpModel, self.n_particles)
+            obsModel = ObsMod(lbpModel, self.n_particles, modelArgs=self.modelArgs)
+            
+        elif self.obsmodel == "LBP integral histogram":
+            # Observation model: LBP histogram from integral histograms
+            obsModel = ObsMod(lbpIntegralModel, self.n_particles, modelArgs=self.modelArgs)
+            
+        elif self.obsmodel == "HOG-based":
+            # Observation model: HOG histogram
+            obsModel = ObsMod(hogModel, self.n_particles, modelArgs=self.modelArgs)
+            
+        elif self.obsmodel == "Ellipse contour":
+            # Observation model: gradients on the head contour
+            obsModel = ObsMod(ellipseModel, self.n_particles, modelArgs=self.modelArgs)
+            
+        elif self.obsmodel == "Template correlation":
+            # Observation model: correlation with the face template
+            obsModel = ObsMod(templateModel, self.n_particles, modelArgs=self.modelArgs)
+            
+        elif self.obsmodel == "HSV+LBP fused":
+            # Observation model: HSV and LBP histograms
+            obsModel = ObsMod(fusedModel, self.n_particles, modelArgs=self.modelArgs)
         #-------------------------------------------------------------
                     
         # 2D-Face model
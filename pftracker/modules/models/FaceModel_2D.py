@@ -11,6 +11,7 @@ import numpy as np
 from pftracker.modules.facedetection import detect_one_face
 from pftracker.modules.metrics.eval_2DFace import error
 from pftracker.modules.models.predictBB import self_updating_bbox
+from pftracker.modules.models.frameContext import FrameContext
 
 
 class FaceTracking_2D():
@@ -33,10 +34,19 @@ class FaceTracking_2D():
             with VideoCapture or VideoStream
         saveVideo (str, optional): Path to the output video file.
             Default is None
+        cropRegion (bool, optional): calculate the frame-level features of 
+            the observation model only on the region covered by the 
+            particles. Default is True
+        refUpdate (int, optional): every refUpdate frames the estimated face
+            is added to the references of the observation model. Default is
+            None (only the first face detection is used as reference)
+        modelArgs (dict, optional): keyword arguments of the especific 
+            observation model, passed to it when it is initialized with the
+            first face detection. Default is None
     """ 
     
     def __init__(self, movModel, obsModel, N, size_v, first_frame, detector, v, video_stream, 
-                 saveVideo=None):
+                 saveVideo=None, cropRegion=True, refUpdate=None, modelArgs=None):
         self.movModel = movModel
         self.obsModel = obsModel
         self.N = N
@@ -60,6 +70,15 @@ class FaceTracking_2D():
         # variable for saving output video with the tracking implementation
         self.writer = None
         self.saveVideo = saveVideo
+        
+        # frame-level features restricted to the particles region
+        self.cropRegion = cropRegion
+        
+        # period of the reference updates
+        self.refUpdate = refUpdate
+        
+        # arguments of the especific observation model
+        self.modelArgs = dict(modelArgs or {})
                
     def initialization(self):   
         """Create intial particles distribution.
@@ -75,7 +94,8 @@ class FaceTracking_2D():
         startX,startY,endX,endY = detect_one_face(self.frame).detector(self.detector)   
 
         # Calculate reference histogram
-        self.obsModel.calcHist_ref(self.frame, (startX, startY, endX, endY))  
+        self.obsModel.calcHist_ref(self.frame, (startX, startY, endX, endY), 
+                                   **self.modelArgs)
             
         w = endX - startX     # bounding box width 
         h = endY - startY     # bounding box height 
@@ -143,7 +163,8 @@ class FaceTracking_2D():
                 (size_v, N) dimension
 
         Returns:
-            (array) of likelihoods p(z_{k}|x_{k}) with (1,N) dimension
+            (array) of log-likelihoods log p(z_{k}|x_{k}) with (1,N) 
+            dimension
          """
          
         # grab the current frame
@@ -157,9 +178,14 @@ class FaceTracking_2D():
         if self.frame is None:
             self.close_e(True)        
         
-        self.likelihood = self.obsModel.calcDistance(self.frame, particles, self.bbox)          
+        # create the context sharing the frame-level features of the 
+        # current frame
+        self.context = FrameContext(self.frame, self.particles_region(particles))
+        
+        self.logLikelihood = self.obsModel.calcLogDistance(self.context, particles, 
+                                                           self.bbox)          
             
-        return self.likelihood 
+        return self.logLikelihood 
     
     def update_apf(self, particles):  
         """Evaluate predicted particles x_{k}^{idx}.
@@ -169,19 +195,60 @@ class FaceTracking_2D():
         the indixes resulting from resampling of the first stage 
         weigths of auxiliary particle filter algorithm.
 
+        The frame-level features calculated in the update method
+        for the current frame are reused here, unless the particles
+        have moved out of the region where they were calculated.
+
         Args:
             particles (array): predicted particles array x_{k}^{idx} with 
                 (size_v, N) dimension
 
         Returns:
-            (array) of likelihoods p(z_{k}|x_{k}^{idx}) with (1,N) dimension
+            (array) of log-likelihoods log p(z_{k}|x_{k}^{idx}) with (1,N) 
+            dimension
          """     
+        
+        region = self.particles_region(particles)
+        if not self.context.contains(region):
+            # extend the region to the new particles
+            region = np.r_[np.minimum(region[:2], self.context.region[:2]),
+                           np.maximum(region[2:], self.context.region[2:])]
+            self.context = FrameContext(self.frame, region)
          
-        self.likelihood = self.obsModel.calcDistance(self.frame, particles, self.bbox)          
+        self.logLikelihood = self.obsModel.calcLogDistance(self.context, particles, 
+                                                           self.bbox)          
             
-        return self.likelihood
+        return self.logLikelihood
              
         
+    def particles_region(self, particles):
+        """Region of the frame covered by the particles.
+        
+        The bounding box of the particles positions is padded by the 
+        bounding box width, so it contains the bounding boxes of all the
+        particles and their neighbourhood.
+        
+        Args:
+            particles (array): particles array x_{k} with (size_v, N) 
+                dimension
+                
+        Returns:
+            (tuple) (x0, y0, x1, y1) region of the frame, all the frame if 
+            cropRegion is False
+        """
+        
+        height, width = self.frame.shape[:2]
+        if not self.cropRegion:
+            return (0, 0, width, height)
+        
+        pad = int(self.bbox)
+        x0 = int(np.clip(np.min(particles[0, :]) - pad, 0, width-1))
+        y0 = int(np.clip(np.min(particles[1, :]) - pad, 0, height-1))
+        x1 = int(np.clip(np.max(particles[0, :]) + pad + 1, x0+1, width))
+        y1 = int(np.clip(np.max(particles[1, :]) + pad + 1, y0+1, height))
+        
+        return (x0, y0, x1, y1)
+        
     def visualizations(self, estimate, particles):   
         """
         Visualization function for particles, resulting estimation and bounding box.
@@ -220,18 +287,20 @@ class FaceTracking_2D():
         
         # call draw_circle, draw_cross and draw_rectangle functions on image
         def showing():
+            image = self.context.image
+            
             for i in range (self.N):
-                draw_circle(self.frame, particles.T[i].astype(int), 1, (0, 0, 255))  
+                draw_circle(image, particles.T[i].astype(int), 1, (0, 0, 255))  
             
             # draw the estimate output particle as a cross
-            draw_cross(self.frame,(estimate[0].astype(int), estimate[1].astype(int)),
+            draw_cross(image,(estimate[0].astype(int), estimate[1].astype(int)),
                                   (0, 255, 0), 3)
             
             # draw the face bounding box determine by the estimate output particle
-            draw_rectangle(self.frame, (estimate[0].astype(int), estimate[1].astype(int)),
+            draw_rectangle(image, (estimate[0].astype(int), estimate[1].astype(int)),
                           self.bbox, (0, 255, 0)) 
             
-            cv2.imshow('2D Face Tracking', self.frame)
+            cv2.imshow('2D Face Tracking', image)
 
             # close window if the user does it
             if cv2.waitKey(30) & 0xFF == 27 or cv2.getWindowProperty('2D Face Tracking', cv2.WND_PROP_VISIBLE) < 1:
@@ -239,6 +308,10 @@ class FaceTracking_2D():
   
         self.frameCounter +=1  
         
+        # add the estimated face to the references before drawing on the frame
+        if self.refUpdate and self.frameCounter % self.refUpdate == 0:
+            self.update_reference(estimate)
+        
         if self.size_v==4: 
             showing()
             center = [estimate[0], estimate[1]] 
@@ -260,6 +333,23 @@ class FaceTracking_2D():
 #            cv2.imwrite(p, self.frame)
    
     
+    def update_reference(self, estimate):
+        """Add the face bounding box of the estimate to the references of 
+        the observation model.
+        
+        Args:
+            estimate (array): estimated particle filter tracking result array
+                with (size_v, 1) dimension
+        """
+        s = self.bbox//2
+        x, y = int(estimate[0]), int(estimate[1])
+        
+        startY, endY = max(y-s, 0), min(y+s, self.frame.shape[0])
+        startX, endX = max(x-s, 0), min(x+s, self.frame.shape[1])
+        
+        if endY > startY and endX > startX:
+            self.obsModel.addReference(self.frame, (startX, startY, endX, endY))
+    
     def getEstimation(self):
         """Get particle filter estimation."""
         return self.track
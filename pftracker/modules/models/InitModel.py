@@ -9,12 +9,15 @@ import numpy as np
 from pftracker.modules.models import dlg
 
 
-def createMovModel(estate_var):
+def createMovModel(estate_var, rng=None):
     """ 
     Create a dynamic model for propagating particles to the next state.
 
     Args:
        estate_var (str): State space model
+       rng (numpy.random.Generator, optional): random number generator of
+           the process noise. Default is None, a generator seeded from the 
+           global numpy random state
            
     Supported estate_var:
         - 'dynamic_bbox': Self updating bounding box model. 
@@ -90,7 +93,7 @@ def createMovModel(estate_var):
     mu = np.zeros(size_ve) 
            
     # create Discrete-time Linear and gaussian model
-    dlg_model = dlg(F, mu, Sigma)
+    dlg_model = dlg(F, mu, Sigma, rng)
     
     return dlg_model, size_ve
 
@@ -5,29 +5,86 @@ Module containing observation models.
 @author: Bessie Domínguez-Dáger
 """
 
+import numpy as np
+from pftracker.modules.models.frameContext import FrameContext
   
 class ObsMod():
     """Observation Model base class.
     
+    Particles at the same (x, y) position share the bounding box and
+    therefore the likelihood, so the observation model is evaluated just 
+    once for each different position. The fraction of particles whose 
+    likelihood was reused is kept in hit_rate.
+    
+    In coarse-to-fine mode all the particles are first evaluated on a 
+    downscaled frame of the image pyramid, and only the best ranked ones 
+    are evaluated again at full resolution. The rest of the particles keep 
+    their coarse likelihood. Models with a fixed bounding box size 
+    (fixedScale attribute) are always evaluated at full resolution, since 
+    their box does not scale with the frame.
+    
+    In dense field mode, when there are more particles than nodes of a 
+    regular grid covering them, the likelihood is evaluated on the grid
+    nodes and read for each particle by bilinear interpolation, so the 
+    cost per frame is bounded by the grid size.
+    
+    The likelihoods can be calculated in log domain with calcLogDistance,
+    which keeps sharp likelihoods of far particles from underflowing to 
+    zero.
+    
     Args:
         bins (list): number of bins of the HSV histogram. The list
             contains 3 values corresponding to the number of bins for
             each component of the HSV color space (h, s and v) 
         N (int): number of particles 
+        memoize (bool, optional): evaluate just once the particles with
+            the same position. Default is True
+        coarseLevel (int, optional): pyramid level of the coarse 
+            evaluation, the frame is downscaled by 2**coarseLevel. Default 
+            is 0 (no coarse evaluation)
+        refinePercent (int, optional): percent of the particles, ranked by
+            their coarse likelihood, evaluated again at full resolution.
+            Default is 20
+        fieldStride (int, optional): distance in pixels between the nodes 
+            of the likelihood field grid. Default is None (no dense field)
+        fieldRatio (float, optional): the dense field is used when the 
+            number of particles is greater than fieldRatio times the number
+            of grid nodes. Default is 1
+        modelArgs (dict, optional): keyword arguments of the especific 
+            observation model, e.g. {"kernel": True} for hsvModel. Default 
+            is None (default arguments of the model)
         
     """
     
-    def __init__(self, model, N):
+    def __init__(self, model, N, memoize=True, coarseLevel=0, refinePercent=20,
+                 fieldStride=None, fieldRatio=1., modelArgs=None):
         self.N = N          # N: number of particles            
         
         # Initialize the image descriptor -- a 3D HSV histogram
         self.model = model
+        self.modelArgs = dict(modelArgs or {})
+        
+        # likelihood memoization by particle position
+        self.memoize = memoize
+        self.hit_rate = 0.          # hit rate of the last evaluation 
+        self.n_requested = 0        # number of likelihoods requested
+        self.n_evaluated = 0        # number of likelihoods evaluated
+        
+        # coarse-to-fine evaluation
+        self.coarseLevel = coarseLevel
+        self.refinePercent = refinePercent
+        
+        # dense likelihood field evaluation
+        self.fieldStride = fieldStride
+        self.fieldRatio = fieldRatio
                                                                                                     
-    def calcHist_ref(self, first_frame, bounding_box):
+    def calcHist_ref(self, first_frame, bounding_box, **modelArgs):
         """Calculate reference histogram.
         
         first_frame (array): first frame of the video sequences
         bounding_box (array): face bounding box for the first frame
+        **modelArgs: keyword arguments of the especific observation model,
+            overriding the ones given at construction
         """
         
         # set up the ROI where calculate the histogram
@@ -35,20 +92,159 @@ class ObsMod():
         roi = first_frame[y1:y2, x1:x2]
         
         # Initialize the especific observation model
-        self.model = self.model(roi, self.N)       
+        self.model = self.model(roi, self.N, **{**self.modelArgs, **modelArgs})
        
-    def calcDistance(self, image, particles, s):   
-        """Calculate the likelihood of each particle.
+    def addReference(self, image, bounding_box):
+        """Add a reference to the observation model.
         
         Args:
             image (array): frame at time k
+            bounding_box (array): face bounding box at time k
+        """
+        x1,y1,x2,y2 = bounding_box
+        self.model.addReference(image[y1:y2, x1:x2])
+        
+    def calcDistance(self, image, particles, s, log=False):   
+        """Calculate the likelihood of each particle.
+        
+        Args:
+            image (array or FrameContext): frame at time k. Frame-level 
+                features are shared between calls made with the same
+                FrameContext object
             particles (array): particles at time k
             s (int): bounding box width
+            log (bool, optional): return log-likelihoods. Default is False
             
         Returns:
-            (array) of likelihoods p(z_{k}|x_{k}) with (1,N) dimension
+            (array) of likelihoods p(z_{k}|x_{k}) with (1,N) dimension, 
+            log-likelihoods if log is True
         """  
-                                  
-        likelihood = self.model.calcLikelihood(image, particles, s)
+        
+        if not isinstance(image, FrameContext):
+            image = FrameContext(image)
+        
+        if not self.memoize:
+            likelihood = self.evaluate(image, particles, s, log)
+            return likelihood
+        
+        # get the particles with different (x, y) position 
+        _, first, inverse = np.unique(particles[:2, :].T, axis=0, 
+                                      return_index=True, return_inverse=True)
+        
+        # evaluate each position once and scatter the results to all
+        # the particles
+        likelihood = self.evaluate(image, particles[:, first], s, log)
+        likelihood = likelihood[:, inverse.ravel()]
+        
+        # update hit rate
+        nPart = particles.shape[1]
+        self.hit_rate = 1. - first.size / nPart
+        self.n_requested += nPart
+        self.n_evaluated += first.size
+        
         return likelihood
-    
\ No newline at end of file
+    
+    def calcLogDistance(self, image, particles, s):   
+        """Calculate the log-likelihood of each particle.
+        
+        Args:
+            image (array or FrameContext): frame at time k
+            particles (array): particles at time k
+            s (int): bounding box width
+            
+        Returns:
+            (array) of log-likelihoods log p(z_{k}|x_{k}) with (1,N) 
+            dimension
+        """  
+        
+        return self.calcDistance(image, particles, s, log=True)
+    
+    def evaluate(self, frame, particles, s, log=False):
+        """Evaluate the observation model, coarse-to-fine if enabled.
+        
+        Args:
+            frame (FrameContext): frame at time k
+            particles (array): particles at time k
+            s (int): bounding box width
+            log (bool, optional): return log-likelihoods. Default is False
+            
+        Returns:
+            (array) of likelihoods p(z_{k}|x_{k}) with (1,N) dimension,
+            log-likelihoods if log is True
+        """
+        
+        # likelihood function of the model
+        calcLikelihood = (self.model.calcLogLikelihood if log 
+                          else self.model.calcLikelihood)
+        
+        if self.fieldStride is not None:
+            likelihood = self.evaluateField(frame, particles, s, log)
+            if likelihood is not None:
+                return likelihood
+        
+        if self.coarseLevel == 0 or getattr(self.model, "fixedScale", False):
+            return calcLikelihood(frame, particles, s)
+        
+        # evaluate all the particles on the downscaled frame
+        scale = 2 ** self.coarseLevel
+        coarseParticles = particles.astype(float)
+        coarseParticles[:2, :] /= scale
+        likelihood = calcLikelihood(frame.pyramid(self.coarseLevel),
+                                    coarseParticles, max(s // scale, 1))
+        
+        # evaluate again the best ranked particles at full resolution
+        nPart = particles.shape[1]
+        nRefine = int(np.clip(round(self.refinePercent * nPart/100), 1, nPart))
+        best = np.argpartition(-likelihood[0], nRefine-1)[:nRefine]
+        likelihood[:, best] = calcLikelihood(frame, particles[:, best], s)
+        
+        return likelihood
+    
+    def evaluateField(self, frame, particles, s, log=False):
+        """Evaluate the observation model on a grid covering the particles.
+        
+        Args:
+            frame (FrameContext): frame at time k
+            particles (array): particles at time k
+            s (int): bounding box width
+            log (bool, optional): interpolate the log-likelihood field and
+                return log-likelihoods. Default is False
+            
+        Returns:
+            (array) of likelihoods p(z_{k}|x_{k}) with (1,N) dimension 
+            interpolated from the grid, or None if there are less particles 
+            than fieldRatio times the grid nodes
+        """
+        
+        # grid covering the particles positions
+        stride = self.fieldStride
+        minX, minY = particles[0, :].min(), particles[1, :].min()
+        nx = int(np.ceil((particles[0, :].max() - minX) / stride)) + 1
+        ny = int(np.ceil((particles[1, :].max() - minY) / stride)) + 1
+        
+        nPart = particles.shape[1]
+        if nPart <= self.fieldRatio * nx * ny:
+            return None
+        
+        # likelihood of the grid nodes 
+        nodes = np.zeros((particles.shape[0], ny * nx))
+        nodes[0, :] = np.tile(minX + stride * np.arange(nx), ny)
+        nodes[1, :] = np.repeat(minY + stride * np.arange(ny), nx)
+        if log:
+            field = self.model.calcLogLikelihood(frame, nodes, s)
+        else:
+            field = self.model.calcLikelihood(frame, nodes, s)
+        field = field.reshape(ny, nx)
+        
+        # bilinear interpolation of the field at the particles positions
+        x = (particles[0, :] - minX) / stride
+        y = (particles[1, :] - minY) / stride
+        c0 = np.minimum(np.floor(x).astype(int), max(nx - 2, 0))
+        r0 = np.minimum(np.floor(y).astype(int), max(ny - 2, 0))
+        c1 = np.minimum(c0 + 1, nx - 1)
+        r1 = np.minimum(r0 + 1, ny - 1)
+        dc, dr = x - c0, y - r0
+        likelihood = ((1 - dr) * ((1 - dc) * field[r0, c0] + dc * field[r0, c1]) 
+                      + dr * ((1 - dc) * field[r1, c0] + dc * field[r1, c1]))
+        
+        return likelihood.reshape(1, -1)
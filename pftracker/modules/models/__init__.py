@@ -2,4 +2,5 @@ from .dlgModel import *
 from .FaceModel_2D import *
 from .InitModel import *
 from .ObsModels import *
+from .frameContext import FrameContext
 from .predictBB import self_updating_bbox
\ No newline at end of file
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+hsvBackProjModel class defines an HSV back-projection model for calculating
+the likelihoods of particles at actual time k.
+
+@author: Bessie Domínguez-Dáger
+"""
+import cv2
+import numpy as np
+from pftracker.modules.models.colorhist.hsvhistogram import HSVHistogram, bgr_bin_lut
+from pftracker.modules.models.referenceBank import ReferenceBank
+
+class hsvBackProjModel():
+    """HSV color back-projection model.
+    
+    The reference HSV histogram is back-projected on the frame, giving the
+    probability of each pixel of belonging to the face color. A summed-area
+    table of the probability map is built once per frame, so the mean 
+    probability inside the bounding box of each particle is read with four 
+    lookups. The cost per particle is constant, which allows tracking with
+    tens of thousands of particles.
+    
+    With several references, the probability of each bin is its maximum 
+    over the reference histograms, so a pixel belongs to the face color if
+    it matches any of them. When the bank is full the oldest added 
+    reference is evicted, except the first one.
+    
+    Args:
+        hist_ref (array): reference HSV histogram
+        references (ReferenceBank): reference HSV histograms, the first one
+            is hist_ref
+        hsvHistCalc (HSVHistogram): image descriptor (3D HSV histogram)
+        N (int): number of particles
+        l (int, optional): lambda coefficient of the likelihood       
+        maxReferences (int, optional): maximum number of reference 
+            histograms. Default is 5
+    """
+    
+    def __init__(self, roi, N, l=20, maxReferences=5):        
+        self.hsvHistCalc = HSVHistogram([8, 8, 4])
+        self.hist_ref = self.hsvHistCalc.calc_Hist(roi)
+        self.references = ReferenceBank(self.hist_ref, "bhattacharyya", maxReferences)
+        
+        # build the BGR lookup table of the bin indexes before the first frame
+        bgr_bin_lut(tuple(self.hsvHistCalc.bins))
+        
+        self.version = 0    # number of reference updates
+        self.probabilities = self.calcProbabilities()
+        self.N = N          
+        self.l = l
+        self.distances = np.zeros((1, self.N))
+        
+    def addReference(self, roi):
+        """Add a reference HSV histogram to the reference bank and update
+        the back-projected probabilities.
+        
+        Args:
+            roi (array): image of the face from wich to calculate the 
+                reference histogram
+        """
+        self.references.add(self.hsvHistCalc.calc_Hist(roi))
+        self.version += 1
+        self.probabilities = self.calcProbabilities()
+        
+    def calcProbabilities(self):
+        """Probability of each bin of the HSV histogram.
+        
+        Returns:
+            (array) of probabilities with (n_bins+1,) dimension, the pixels 
+            discarded by the mask (last bin index) have zero probability
+        """
+        return np.append(self.references.hists.max(axis=0) / 255., 0.).astype(np.float32)
+        
+    def calcLikelihood(self, frame, particles, s):
+        """Calculate the likelihood of each particle.
+        
+        Args:
+            frame (FrameContext): frame at time k and its shared features
+            particles (array): particles at time k
+            s (int): bounding box width
+            
+        Returns:
+            (array) of likelihoods p(z_{k}|x_{k}) with (1,N) dimension
+        """
+        return np.exp(self.calcLogLikelihood(frame, particles, s))
+        
+    def calcLogLikelihood(self, frame, particles, s):
+        """Calculate the log-likelihood of each particle.
+        
+        The distance of each particle is one minus the mean back-projected
+        probability inside its bounding box.
+        
+        Args:
+            frame (FrameContext): frame at time k and its shared features
+            particles (array): particles at time k
+            s (int): bounding box width
+            
+        Returns:
+            (array) of log-likelihoods log p(z_{k}|x_{k}) with (1,N) dimension
+        """
+  
+        s=s//2
+        
+        # back-projection of the reference histogram and its summed-area 
+        # table, calculated once per frame
+        def backProjection():
+            binMap = frame.hsv_bins(self.hsvHistCalc)
+            return cv2.integral(self.probabilities[binMap])
+        sat = frame.memoize(("hsv_backproj", id(self), self.version), backProjection)
+        
+        # set the boundaries of bounding box of each particle on image
+        minX, minY, maxX, maxY = frame.bounds(particles, s)
+        
+        # mean probability inside each bounding box
+        total = sat[maxY, maxX] - sat[minY, maxX] - sat[maxY, minX] + sat[minY, minX]
+        area = (maxX - minX) * (maxY - minY)
+        meanProb = np.where(area > 0, total / np.maximum(area, 1), 0.)
+        
+        self.distances = (1. - meanProb).reshape(1, -1)
+    
+        # calculate the log-likelihood  
+        logLikelihood = -self.l*self.distances**2
+        
+        return logLikelihood
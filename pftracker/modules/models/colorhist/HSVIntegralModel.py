@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+hsvIntegralModel class defines an HSV model for calculating the likelihoods 
+of particles at actual time k using integral histograms.
+
+@author: Bessie Domínguez-Dáger
+"""
+import numpy as np
+from pftracker.modules.models.colorhist.hsvhistogram import HSVHistogram, bgr_bin_lut
+from pftracker.modules.models.integralHistogram import IntegralHistogram
+from pftracker.modules.models.histDistances import minmax_normalize
+from pftracker.modules.models.referenceBank import ReferenceBank
+
+class hsvIntegralModel():
+    """HSV color-based model with integral histograms.
+    
+    It gives the same likelihoods than hsvModel, but the frame is quantized 
+    just once into the bin indexes of the 3D HSV histogram and an integral
+    histogram is built once per frame over the region covered by the 
+    particles. Then the histogram of each particle is read with four 
+    lookups per bin, so the cost per particle does not depend on the 
+    bounding box size.
+    
+    Args:
+        hist_ref (array): reference HSV histogram
+        references (ReferenceBank): reference HSV histograms, the first one
+            is hist_ref
+        hsvHistCalc (HSVHistogram): image descriptor (3D HSV histogram)
+        integralHist (IntegralHistogram): integral histogram of the frame, 
+            its buffer is reused across frames
+        N (int): number of particles
+        l (int, optional): lambda Bhattacharyya distance coefficient       
+        maxReferences (int, optional): maximum number of reference 
+            histograms. Default is 5
+        match (str, optional): distance of each particle to the 
+            references, 'best' or 'soft' as in ReferenceBank. Default is 
+            'best'
+    """
+    
+    def __init__(self, roi, N, l=20, maxReferences=5, match="best"):        
+        self.hsvHistCalc = HSVHistogram([8, 8, 4])
+        self.hist_ref = self.hsvHistCalc.calc_Hist(roi)
+        
+        # build the BGR lookup table of the bin indexes before the first frame
+        bgr_bin_lut(tuple(self.hsvHistCalc.bins))
+        self.references = ReferenceBank(self.hist_ref, "bhattacharyya", maxReferences, match)
+        self.integralHist = IntegralHistogram(self.hsvHistCalc.n_bins)
+        self.N = N          
+        self.l = l
+        self.distances = np.zeros((1, self.N))
+        
+    def addReference(self, roi):
+        """Add a reference HSV histogram to the reference bank.
+        
+        Args:
+            roi (array): image of the face from wich to calculate the 
+                reference histogram
+        """
+        self.references.add(self.hsvHistCalc.calc_Hist(roi))
+        
+    def calcLikelihood(self, frame, particles, s):
+        """Calculate the likelihood of each particle.
+        
+        Args:
+            frame (FrameContext): frame at time k and its shared features
+            particles (array): particles at time k
+            s (int): bounding box width
+            
+        Returns:
+            (array) of likelihoods p(z_{k}|x_{k}) with (1,N) dimension
+        """
+        return np.exp(self.calcLogLikelihood(frame, particles, s))
+        
+    def calcLogLikelihood(self, frame, particles, s):
+        """Calculate the log-likelihood of each particle.
+        
+        This function calcultes the distance between the reference histogram 
+        and the histograms obtained for the actual set of particles at time k.
+        To do this it is used the Bhattacharyya distance metric.
+        
+        Args:
+            frame (FrameContext): frame at time k and its shared features
+            particles (array): particles at time k
+            s (int): bounding box width
+            
+        Returns:
+            (array) of log-likelihoods log p(z_{k}|x_{k}) with (1,N) dimension
+        """
+  
+        s=s//2
+        
+        # set the boundaries of bounding box of each particle on image
+        minX, minY, maxX, maxY = frame.bounds(particles, s)
+        
+        # quantize the frame into HSV bins and build the integral histogram
+        # of the particles region, shared by the calls within the frame
+        binMap = frame.hsv_bins(self.hsvHistCalc)
+        integralHist = frame.integral_histogram(self.integralHist, binMap, 
+                                                (minX, minY, maxX, maxY))
+        
+        # get the histograms of all particles and normalize them
+        HSVhists = integralHist.query(minX, minY, maxX, maxY)
+        HSVhists = minmax_normalize(HSVhists, alpha=0, beta=255)
+        
+        # calculate histograms distance by Bhattacharyya distance
+        self.distances = self.references.distances(HSVhists).reshape(1, -1)
+    
+        # calculate the log-likelihood  
+        logLikelihood = -self.l*self.distances**2
+        
+        return logLikelihood
@@ -6,8 +6,11 @@ particles at actual time k.
 @author: Bessie Domínguez-Dáger
 """
 import numpy as np
-from pftracker.modules.models.colorhist.hsvhistogram import HSVHistogram
-import cv2
+from pftracker.modules.models.colorhist.hsvhistogram import HSVHistogram, epanechnikov_kernel, bgr_bin_lut
+from pftracker.modules.models.particleROI import roi_grid
+from pftracker.modules.models.histDistances import minmax_normalize
+from pftracker.modules.models.referenceBank import ReferenceBank
+from pftracker.modules.models.numbaKernels import roi_histograms, kernel_histograms, bhattacharyya_minmax, warmup
 
 class hsvModel():
     """HSV color-based model.
@@ -17,52 +20,175 @@ class hsvModel():
     
     Args:
         hist_ref (array): reference HSV histogram
+        references (ReferenceBank): reference HSV histograms, the first one
+            is hist_ref
         hsvHistCalc (HSVHistogram): image descriptor (3D HSV histogram)
         N (int): number of particles
         l (int, optional): lambda Bhattacharyya distance coefficient       
+        gridSize (int, optional): number of pixels sampled in each 
+            direction of the bounding boxes. The histograms are built from
+            a fixed grid of gridSize x gridSize pixels, so their cost does 
+            not depend on the size of the face. Default is None (all the 
+            pixels)
+        kernel (bool, optional): weight the pixels of each bounding box with
+            an Epanechnikov kernel, reducing the influence of the background
+            near the box edges. Default is False
+        maxReferences (int, optional): maximum number of reference 
+            histograms. Default is 5
+        match (str, optional): distance of each particle to the 
+            references, 'best' or 'soft' as in ReferenceBank. Default is 
+            'best'
     """
     
-    def __init__(self, roi, N, l=20):        
-        self.hsvHistCalc = HSVHistogram([8, 8, 4])
+    def __init__(self, roi, N, l=20, gridSize=None, kernel=False, maxReferences=5, match="best"):        
+        self.hsvHistCalc = HSVHistogram([8, 8, 4], kernel=kernel)
         self.hist_ref = self.hsvHistCalc.calc_Hist(roi)
+        
+        # build the BGR lookup table of the bin indexes before the first frame
+        bgr_bin_lut(tuple(self.hsvHistCalc.bins))
+        self.sqrt_ref = np.sqrt(self.hist_ref.astype(np.float64))
+        self.references = ReferenceBank(self.hist_ref, "bhattacharyya", maxReferences, match)
         self.N = N          
         self.l = l
+        self.gridSize = gridSize
         self.distances = np.zeros((1, self.N))
         
-    def calcLikelihood(self, image, particles, s):
+        # compile the kernels before the first frame
+        warmup()
+        
+    def addReference(self, roi):
+        """Add a reference HSV histogram to the reference bank.
+        
+        Args:
+            roi (array): image of the face from wich to calculate the 
+                reference histogram
+        """
+        self.references.add(self.hsvHistCalc.calc_Hist(roi))
+        
+    def calcLikelihood(self, frame, particles, s):
         """Calculate the likelihood of each particle.
         
+        Args:
+            frame (FrameContext): frame at time k and its shared features
+            particles (array): particles at time k
+            s (int): bounding box width
+            
+        Returns:
+            (array) of likelihoods p(z_{k}|x_{k}) with (1,N) dimension
+        """
+        return np.exp(self.calcLogLikelihood(frame, particles, s))
+        
+    def calcGridHists(self, binMap, minX, minY, maxX, maxY):
+        """Calculate the histograms of a fixed grid of pixels of each 
+        bounding box.
+        
+        Args:
+            binMap (array): HSV bin index of each pixel of the frame
+            minX, minY, maxX, maxY (array): bounding boxes with (N,) 
+                dimension
+            
+        Returns:
+            (array) of float32 histograms with (N, n_bins) dimension
+        """
+        
+        n_bins = self.hsvHistCalc.n_bins
+        nPart = minX.shape[0]
+        
+        # sample the bin indexes of the grid, empty boxes are set to the 
+        # index of the pixels discarded by the mask
+        rows, cols, valid = roi_grid(minX, minY, maxX, maxY, self.gridSize)
+        rows = np.minimum(rows, binMap.shape[0]-1)
+        cols = np.minimum(cols, binMap.shape[1]-1)
+        samples = binMap[rows, cols].reshape(nPart, -1).astype(np.intp)
+        samples[~valid] = n_bins
+        
+        # the grid points are the cell centers of the boxes, so they take 
+        # the kernel weights of a gridSize x gridSize box
+        weights = None
+        if self.hsvHistCalc.kernel:
+            kernel = epanechnikov_kernel(self.gridSize, self.gridSize).ravel()
+            weights = np.broadcast_to(kernel, samples.shape).ravel()
+        
+        # count the bins of all the particles at once, offsetting the bin 
+        # indexes of each particle
+        samples += (n_bins+1) * np.arange(nPart)[:, None]
+        counts = np.bincount(samples.ravel(), weights, minlength=nPart*(n_bins+1))
+        
+        return counts.reshape(nPart, n_bins+1)[:, :n_bins].astype(np.float32)
+    
+    def calcKernelHists(self, frame, binMap, particles, s, minX, minY, maxX, maxY):
+        """Calculate the Epanechnikov kernel weighted histograms of the
+        bounding boxes.
+        
+        The kernel is centered at each particle, so the boxes clipped by 
+        the frame borders only take the weights of their pixels.
+        
+        Args:
+            frame (FrameContext): frame at time k and its shared features
+            binMap (array): HSV bin index of each pixel of the frame
+            particles (array): particles at time k
+            s (int): half of the bounding box width
+            minX, minY, maxX, maxY (array): bounding boxes with (N,) 
+                dimension
+            
+        Returns:
+            (array) of float32 histograms with (N, n_bins) dimension
+        """
+        
+        # top left corner of the full boxes centered at the particles
+        x0, y0 = frame.origin
+        top = np.around(particles[1, :] - s).astype(int) - y0
+        left = np.around(particles[0, :] - s).astype(int) - x0
+        
+        # pixels outside the clipped boxes do not count
+        return kernel_histograms(binMap, top, left, minX, minY, maxX, maxY, 
+                                 epanechnikov_kernel(2*s, 2*s), 
+                                 self.hsvHistCalc.n_bins)
+        
+    def calcLogLikelihood(self, frame, particles, s):
+        """Calculate the log-likelihood of each particle.
+        
         This function calcultes the distance between the reference histogram 
         and the histograms obtained for the actual set of particles at time k.
         To do this it is used the Bhattacharyya distance metric.
         
         Args:
-            image (array): frame at time k
+            frame (FrameContext): frame at time k and its shared features
             particles (array): particles at time k
             s (int): bounding box width
             
         Returns:
-            (array) of likelihoods p(z_{k}|x_{k}) with (1,N) dimension
+            (array) of log-likelihoods log p(z_{k}|x_{k}) with (1,N) dimension
         """
   
         s=s//2
         
-        # loop over the particles
-        for iPart in range(self.N):
-            # set the boundaries of bounding box of each particle on image
-            minY = np.around(np.max((particles[1,iPart]-s, 1))).astype(int)
-            maxY = np.around(np.min((particles[1,iPart]+s, image.shape[0]))).astype(int)
-            minX = np.around(np.max((particles[0,iPart]-s, 1))).astype(int)
-            maxX = np.around(np.min((particles[0,iPart]+s, image.shape[1]))).astype(int)
-          
-            HSVhist = self.hsvHistCalc.calc_Hist(image[minY:maxY, minX:maxX, :])
+        # bin index of each pixel is calculated once for all the particles
+        binMap = frame.hsv_bins(self.hsvHistCalc)
+        
+        # set the boundaries of bounding box of each particle on image
+        minX, minY, maxX, maxY = frame.bounds(particles, s)
+        
+        # build the matrix of histograms of all the particles
+        if self.gridSize is not None:
+            HSVhists = self.calcGridHists(binMap, minX, minY, maxX, maxY)
+        elif self.hsvHistCalc.kernel:
+            HSVhists = self.calcKernelHists(frame, binMap, particles, s, 
+                                            minX, minY, maxX, maxY)
+        else:
+            HSVhists = roi_histograms(binMap, minX, minY, maxX, maxY, self.hsvHistCalc.n_bins)
                 
-            # calculate histograms distance by Bhattacharyya distance
-            dBhattacharyya = cv2.compareHist(self.hist_ref, HSVhist, method = cv2.HISTCMP_BHATTACHARYYA)
-            self.distances[0, iPart] = dBhattacharyya
+        # normalize all histograms into the range [0, 255] and calculate 
+        # histograms distance by Bhattacharyya distance
+        if len(self.references) == 1:
+            self.distances = bhattacharyya_minmax(self.hist_ref, HSVhists, 
+                                                  self.sqrt_ref).reshape(1, -1)
+        else:
+            HSVhists = minmax_normalize(HSVhists, alpha=0, beta=255)
+            self.distances = self.references.distances(HSVhists).reshape(1, -1)
     
-        # calculate the likelihood  
-        likelihood = np.exp(-self.l*self.distances**2)
+        # calculate the log-likelihood  
+        logLikelihood = -self.l*self.distances**2
         
-        return likelihood
+        return logLikelihood
         
\ No newline at end of file
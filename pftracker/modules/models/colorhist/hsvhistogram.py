@@ -7,6 +7,67 @@ HSVHistogram creates 3D HSV histogram for an image.
 
 import cv2
 import numpy as np
+from functools import lru_cache
+
+# mask for using all the hue (h) values and ignoring the weakly (s) or 
+# the dim (v) pronounced pixels
+MASK_LOWER = np.array((0., 60.,32.))
+MASK_UPPER = np.array((180.,255.,255.))
+
+@lru_cache(maxsize=32)
+def epanechnikov_kernel(w, h):
+    """Epanechnikov kernel weights of a w x h bounding box.
+    
+    Weights decrease from 1 at the center of the box to 0 at the inscribed
+    ellipse, giving less importance to the pixels near the box edges. The 
+    kernels are cached by box size and returned as read-only arrays.
+    
+    Args:
+        w (int): width of the bounding box
+        h (int): height of the bounding box
+        
+    Returns:
+        (array) of float32 weights with (h, w) dimension
+    """
+    y = (np.arange(h) + 0.5 - h/2) / (h/2)
+    x = (np.arange(w) + 0.5 - w/2) / (w/2)
+    kernel = np.maximum(1. - y[:, None]**2 - x[None, :]**2, 0.).astype(np.float32)
+    kernel.flags.writeable = False
+    return kernel
+
+@lru_cache(maxsize=4)
+def bgr_bin_lut(bins):
+    """Lookup table mapping each 24-bit BGR color to its HSV bin index.
+    
+    The table holds the flattened 3D HSV histogram bin index of each color, 
+    with the saturation and value mask applied, so it is the same as 
+    converting the color to HSV and quantizing it. Colors discarded by the
+    mask are set to the number of bins. The table is cached by number of 
+    bins.
+    
+    Args:
+        bins (tuple): number of bins for each component of the
+            HSV color space
+        
+    Returns:
+        (array) of uint16 bin indexes with (2**24,) dimension, indexed by
+        (r << 16) | (g << 8) | b
+    """
+    hsvHistCalc = HSVHistogram(list(bins))
+    lut = np.empty(2**24, dtype=np.uint16)
+    
+    # the 24-bit colors are arranged as a 4096x4096 image, converted in 
+    # chunks of rows for bounding the memory of the intermediate images
+    chunkSize = 2**20
+    for start in range(0, 2**24, chunkSize):
+        colors = np.arange(start, start + chunkSize, dtype=np.uint32).reshape(-1, 4096)
+        image = np.dstack([(colors >> shift).astype(np.uint8) for shift in (0, 8, 16)])
+        
+        hsvImage = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+        mask = cv2.inRange(hsvImage, MASK_LOWER, MASK_UPPER)
+        lut[start:start + chunkSize] = hsvHistCalc.calc_BinMap_HSV(hsvImage, mask).ravel()
+    lut.flags.writeable = False
+    return lut
 
 class HSVHistogram:
     """3D HSV histogram calculation.
@@ -15,10 +76,13 @@ class HSVHistogram:
         bins (list): number of bins the histogram will use. The list
             contains 3 values corresponding to the number of bins for
             each component of the HSV color space. 
+        kernel (bool, optional): weight the pixels with an Epanechnikov 
+            kernel centered at the image. Default is False
     """
-    def __init__(self, bins):
+    def __init__(self, bins, kernel=False):
         # store the number of bins the histogram will use
         self.bins = bins
+        self.kernel = kernel
         
         # define number of channels and h, s and v ranges
         self.channels = [0, 1, 2]
@@ -26,6 +90,22 @@ class HSVHistogram:
         s_range = [0, 256]
         v_range = [0, 256]
         self.ranges = h_range + s_range + v_range  # Concat list          
+        
+        # total number of bins of the flattened 3D histogram, this value
+        # is also used as the bin index of the pixels discarded by the mask
+        self.n_bins = int(np.prod(self.bins))
+        
+        # create the lookup tables mapping each 8-bit channel value to its 
+        # bin index, in the same way cv2.calcHist does for uniform ranges
+        self.luts = []
+        for i, b in enumerate(self.bins):
+            lo, hi = self.ranges[2*i], self.ranges[2*i+1]
+            t = b / (hi - lo)
+            lut = np.floor(np.arange(256) * t - lo * t).astype(np.intp)
+            self.luts.append(np.clip(lut, 0, b-1))
+        
+        # strides of each channel bin index in the flattened histogram
+        self.strides = [int(np.prod(self.bins[i+1:])) for i in range(3)]
 
     def calc_Hist(self, image):
         """
@@ -40,14 +120,73 @@ class HSVHistogram:
         # construct a mask for using all the hue (h) values in the region 
         # of interest and ignoring the weakly (s) or the dim (v) pronounced
         # areas of the bounding box
-        mask = cv2.inRange(hsvImage, np.array((0., 60.,32.)), np.array((180.,255.,255.)))
+        mask = cv2.inRange(hsvImage, MASK_LOWER, MASK_UPPER)
         
+        return self.calc_Hist_HSV(hsvImage, mask)
+    
+    def calc_Hist_HSV(self, hsvImage, mask, normalize=True):
+        """
+        Returns a 3D histogram for an image already in the HSV colorspace.
+        
+        Args:
+            hsvImage (array): HSV image from wich to create the histogram
+            mask (array): saturation and value mask of the HSV image
+            normalize (bool, optional): normalize the histogram into the 
+                range [0, 255]. Default is True
+        """
         # calculate a 3D histogram in the HSV colorspace and normalize it
         # for getting roughly the same histogram for images with the same 
         # content but different scales.
-        hsv_hist = cv2.calcHist([hsvImage], self.channels, mask, self.bins, self.ranges)        
-        hsv_hist = cv2.normalize(hsv_hist, hsv_hist, alpha=0, beta=255, norm_type=cv2.NORM_MINMAX)
+        if self.kernel:
+            binMap = self.calc_BinMap_HSV(hsvImage, mask)
+            weights = epanechnikov_kernel(binMap.shape[1], binMap.shape[0])
+            hsv_hist = np.bincount(binMap.ravel(), weights.ravel(), 
+                                   minlength=self.n_bins+1)[:self.n_bins]
+            hsv_hist = hsv_hist.astype(np.float32)
+        else:
+            hsv_hist = cv2.calcHist([hsvImage], self.channels, mask, self.bins, self.ranges)        
+        if normalize:
+            hsv_hist = cv2.normalize(hsv_hist, hsv_hist, alpha=0, beta=255, norm_type=cv2.NORM_MINMAX)
 
 		  # return 3D histogram as a flattened array
         return hsv_hist.flatten()
-    
\ No newline at end of file
+    
+    def calc_BinMap(self, image):
+        """
+        Returns the bin index of each pixel of an image.
+        
+        The bin index is the position of the pixel in the flattened 3D HSV
+        histogram returned by calc_Hist. Pixels ignored by the saturation 
+        and value mask are set to n_bins. The bin indexes are taken from a
+        BGR lookup table, without converting the image to HSV.
+        
+        Args:
+            image (array): BGR image from wich to calculate the bin indexes
+        """
+        lut = bgr_bin_lut(tuple(self.bins))
+        
+        # 24-bit color of each pixel, read as little-endian BGR0 words
+        bgra = cv2.cvtColor(image, cv2.COLOR_BGR2BGRA)
+        bgra[:, :, 3] = 0
+        color = bgra.view(np.dtype('<u4'))[:, :, 0]
+        
+        return np.take(lut, color)
+    
+    def calc_BinMap_HSV(self, hsvImage, mask):
+        """
+        Returns the bin index of each pixel of an image in the HSV colorspace.
+        
+        Args:
+            hsvImage (array): HSV image from wich to calculate the bin indexes
+            mask (array): saturation and value mask of the HSV image
+        """
+        # quantize each channel and combine them into the flattened index
+        valid = mask > 0
+        index = np.zeros(np.count_nonzero(valid), dtype=np.intp)
+        for i in range(3):
+            index += self.luts[i][hsvImage[:, :, i][valid]] * self.strides[i]
+        
+        binMap = np.full(hsvImage.shape[:2], self.n_bins, dtype=np.uint16)
+        binMap[valid] = index
+        
+        return binMap
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+ellipseModel class defines an elliptical head contour model for calculating
+the likelihoods of particles at actual time k.
+
+@author: Bessie Domínguez-Dáger
+"""
+
+import numpy as np
+from functools import lru_cache
+
+
+@lru_cache(maxsize=64)
+def ellipse_points(w, M, aspect):
+    """Sampling points of an ellipse and their normals.
+    
+    The ellipse is centered at the origin, its width is w and its height
+    is aspect*w. The points are cached by scale and returned as read-only 
+    arrays.
+    
+    Args:
+        w (int): width of the ellipse
+        M (int): number of points on the perimeter
+        aspect (float): height to width ratio of the ellipse
+        
+    Returns:
+        4-element tuple containing
+        
+        - **dx** (*array*): column offsets of the points with (M,) dimension
+        - **dy** (*array*): row offsets of the points with (M,) dimension
+        - **nx** (*array*): x components of the unit normals with (M,) 
+          dimension
+        - **ny** (*array*): y components of the unit normals with (M,) 
+          dimension
+    """
+    a, b = w / 2., aspect * w / 2.
+    t = 2 * np.pi * np.arange(M) / M
+    
+    dx = np.around(a * np.cos(t)).astype(int)
+    dy = np.around(b * np.sin(t)).astype(int)
+    
+    # the normal of the ellipse (a cos t, b sin t) is (cos t / a, sin t / b)
+    nx, ny = np.cos(t) / a, np.sin(t) / b
+    norm = np.hypot(nx, ny)
+    nx, ny = nx / norm, ny / norm
+    
+    for array in (dx, dy, nx, ny):
+        array.flags.writeable = False
+    return dx, dy, nx, ny
+
+
+class ellipseModel():
+    """Elliptical head contour model.
+    
+    Edge-based model in the style of Birchfield's head tracker. Each 
+    particle is scored by the alignment of the image gradient with the 
+    normals of an ellipse around the head, sampled at M points of the 
+    perimeter. The gradients of the frame are calculated once and the 
+    perimeter points of all the particles are read with a single gather,
+    so the cost per particle is M memory reads.
+    
+    The scores are normalized by a fixed gradient scale, so the likelihood
+    of a particle does not depend on the rest of the particles evaluated in
+    the same call (e.g. the subsets of coarse-to-fine evaluation or the two 
+    stages of the auxiliary particle filter).
+    
+    On cluttered backgrounds the contour alone is ambiguous, so as in 
+    Birchfield's tracker it is better combined with a color cue, e.g. 
+    fusedModel with cues=(hsvModel, ellipseModel).
+    
+    Args:
+        N (int): number of particles
+        M (int, optional): number of points on the ellipse. Default is 36
+        aspect (float, optional): height to width ratio of the head ellipse.
+            Default is 1.2
+        l (int, optional): lambda coefficient of the likelihood
+        scale (float, optional): score of a fully matching contour. The 
+            Sobel response of a step edge of 64 gray levels is 256. Default
+            is 255
+    """
+    def __init__(self, roi, N, M=36, aspect=1.2, l=20, scale=255.):
+        self.N = N
+        self.M = M
+        self.aspect = aspect
+        self.l = l
+        self.scale = scale
+        self.distances = np.zeros((1, self.N))
+        
+    def addReference(self, roi):
+        """The contour model has no reference appearance, so nothing is 
+        added.
+        
+        Args:
+            roi (array): image of the face
+        """
+        pass
+        
+    def calcLikelihood(self, frame, particles, s):    
+        """Calculate the likelihood of each particle.
+        
+        Args:
+            frame (FrameContext): frame at time k and its shared features
+            particles (array): particles at time k
+            s (int): bounding box width
+            
+        Returns:
+            (array) of likelihoods p(z_{k}|x_{k}) with (1,N) dimension
+        """
+        return np.exp(self.calcLogLikelihood(frame, particles, s))
+        
+    def calcLogLikelihood(self, frame, particles, s):    
+        """Calculate the log-likelihood of each particle.
+        
+        The score of each particle is the mean of the absolute dot products
+        between the gradients and the ellipse normals on the perimeter 
+        points.
+        
+        Args:
+            frame (FrameContext): frame at time k and its shared features
+            particles (array): particles at time k
+            s (int): bounding box width
+            
+        Returns:
+            (array) of log-likelihoods log p(z_{k}|x_{k}) with (1,N) dimension
+        """
+        
+        dx, dy, nx, ny = ellipse_points(int(s), self.M, self.aspect)
+        gx, gy = frame.sobel
+        height, width = gx.shape
+        
+        # perimeter points of all particles in the frame region
+        x0, y0 = frame.origin
+        cols = np.around(particles[0, :] - x0).astype(int)[:, None] + dx
+        rows = np.around(particles[1, :] - y0).astype(int)[:, None] + dy
+        inside = (cols >= 0) & (cols < width) & (rows >= 0) & (rows < height)
+        cols = np.clip(cols, 0, width-1)
+        rows = np.clip(rows, 0, height-1)
+        
+        # gradients alignment with the normals, points outside the frame 
+        # do not score
+        alignment = np.abs(gx[rows, cols] * nx + gy[rows, cols] * ny)
+        score = np.mean(alignment * inside, axis=1)
+        
+        # distance relative to the gradient scale
+        self.distances = (1. - np.minimum(score / self.scale, 1.)).reshape(1, -1)
+    
+        # calculate the log-likelihood  
+        logLikelihood = -self.l*self.distances**2
+        
+        return logLikelihood
@@ -9,43 +9,122 @@ import numpy as np
 
 class dlg():
     """
-    Propagate particles from time k-1 to k using a Discrete-time Linear 
+    Propagate particles from time k-1 to k using a Discrete-time Linear
     and gaussian model in the prediction step of particle filters.
-    
+
+    The noise covariance matrix is factored once at construction, its
+    square root when it is diagonal or its Cholesky factor otherwise, so
+    the process noise is drawn by scaling standard normal samples. The
+    samples and the moved particles are written into buffers reused in each
+    call. When F is a constant velocity transition (ones on the diagonal
+    and some ones adding a velocity to a state variable) it is applied as
+    a few in-place additions instead of a matrix product.
+
+    The particles returned are one of two buffers, the one not holding
+    the particles at time k-1, so they are overwritten two calls later.
+
     Args:
         F (array): State transition matrix with (state_vector_size,
-          state_vector_size) dimension  
+          state_vector_size) dimension
         muW (array): Noise-system mean vector with (state_vector_size,1)
             dimension
         SigmaW (array): Noise-system covariance matrix with (state_vector_size,
-          state_vector_size) dimension            
+          state_vector_size) dimension
+        rng (numpy.random.Generator, optional): random number generator of
+            the process noise. Default is None, a generator seeded from the
+            global numpy random state
     """
-    
-    def __init__(self, F, muW, SigmaW):                    
-        self.F = F                    # State transition matrix 
-        self.muW = muW                # noise-system mean vector
-        self.SigmaW = SigmaW          # noise-system covariance matrix                      
-        
-    def move_particles(self, xk_1, N):     
+
+    def __init__(self, F, muW, SigmaW, rng=None):
+        self.F = np.asarray(F, dtype=float)      # State transition matrix
+        self.muW = np.asarray(muW, dtype=float)  # noise-system mean vector
+        self.SigmaW = np.asarray(SigmaW, dtype=float) # noise-system covariance matrix
+
+        if rng is None:
+            rng = np.random.default_rng(np.random.randint(2**31))
+        self.rng = rng
+
+        # factor the noise covariance matrix
+        if np.count_nonzero(self.SigmaW - np.diag(np.diag(self.SigmaW))) == 0:
+            self.sqrtSigmaW = np.sqrt(np.diag(self.SigmaW))[:, None]
+            self.cholSigmaW = None
+        else:
+            self.sqrtSigmaW = None
+            self.cholSigmaW = np.linalg.cholesky(self.SigmaW)
+        self.zeroMean = not np.any(self.muW)
+
+        # (row, column) of the velocities added by a constant velocity F
+        offDiag = self.F - np.eye(len(self.F))
+        if np.all((offDiag == 0) | (offDiag == 1)):
+            self.cvPairs = list(zip(*np.nonzero(offDiag)))
+        else:
+            self.cvPairs = None
+
+        # buffers reused across frames
+        self.shape = None
+
+    def allocate(self, shape):
+        """Allocate the buffers for particles with the given dimension.
+
+        Args:
+            shape (tuple): (state_vector_size,N) dimension of the particles
+        """
+        self.shape = shape
+        self.xk = (np.empty(shape), np.empty(shape))
+        self.muk = np.empty(shape)
+        self.noise = np.empty(shape)
+        self.normal = np.empty(shape) if self.cholSigmaW is not None else None
+
+    def sample_noise(self):
+        """Draw the process noise into the noise buffer.
+
+        Returns:
+            (array) of process noise with (state_vector_size,N) dimension
+        """
+
+        if self.cholSigmaW is None:
+            self.rng.standard_normal(out=self.noise)
+            self.noise *= self.sqrtSigmaW
+        else:
+            self.rng.standard_normal(out=self.normal)
+            np.matmul(self.cholSigmaW, self.normal, out=self.noise)
+
+        if not self.zeroMean:
+            self.noise += self.muW.reshape(-1, 1)
+        return self.noise
+
+    def move_particles(self, xk_1, N):
         """Move particles from time k-1 to time k.
-        
+
         Args:
-            xk_1 (array): particles in the previous state, with 
-                (state_vector_size,N) dimension. 
+            xk_1 (array): particles in the previous state, with
+                (state_vector_size,N) dimension.
             N (int): number of samples
-            
+
         Returns:
             2-element tuple containing
-            
-            - **xk** (*array*): particles in the actual state with 
-              (state_vector_size,N) dimension. 
-            - **muk** (*array*): characterization of x_{k}|x_{k-1} 
-              where particles are moved particles from x_{k-1} to x_{k} 
+
+            - **xk** (*array*): particles in the actual state with
+              (state_vector_size,N) dimension.
+            - **muk** (*array*): characterization of x_{k}|x_{k-1}
+              where particles are moved particles from x_{k-1} to x_{k}
               without include the process noise.
         """
-        
-        noise = np.random.multivariate_normal(self.muW, self.SigmaW, N).T
-        muk = np.dot(self.F, xk_1)
-        xk = muk + noise            # xk: particles in the actual state
+
+        shape = (len(self.F), N)
+        if self.shape != shape:
+            self.allocate(shape)
+
+        # move particles without noise, muk = F * x_{k-1}
+        muk = self.muk
+        if self.cvPairs is not None:
+            np.copyto(muk, xk_1)
+            for row, col in self.cvPairs:
+                muk[row] += xk_1[col]
+        else:
+            np.matmul(self.F, xk_1, out=muk)
+
+        # xk: particles in the actual state
+        xk = self.xk[1] if np.may_share_memory(xk_1, self.xk[0]) else self.xk[0]
+        np.add(muk, self.sample_noise(), out=xk)
         return xk, muk
-        
\ No newline at end of file
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+FrameContext class holds the frame at time k and the frame-level features
+shared by the observation models.
+
+@author: Bessie Domínguez-Dáger
+"""
+
+import cv2
+import numpy as np
+from pftracker.modules.models.colorhist.hsvhistogram import MASK_LOWER, MASK_UPPER
+from pftracker.modules.models.particleROI import roi_bounds
+
+class FrameContext():
+    """Per-frame context of the observation models.
+    
+    It is created once per frame and computes lazily the frame-level 
+    features needed by the observation models. Each feature is calculated 
+    just the first time it is requested and then reused in the rest of the 
+    calls within the same frame (e.g. in both stages of the auxiliary 
+    particle filter or by several observation models).
+    
+    Supported features:
+        - hsv: frame in the HSV colorspace
+        - mask: saturation and value mask of the HSV frame
+        - gray: frame in gray scale
+        - hsv_bins: HSV histogram bin index of each pixel
+        - lbp: uniform Local Binary Patterns (LBP) codes of the frame
+        - gradients: gradient orientation bins and magnitudes of the frame
+        - sobel: horizontal and vertical gradients of the frame
+        - integral_histogram: integral histogram of a bin index feature
+        - pyramid: downscaled frames, with their own context
+    
+    The features can be restricted to a region of the frame, e.g. the one
+    covered by the particles. They are then calculated only on the region
+    and the bounding boxes given by bounds are in region coordinates.
+    
+    Args:
+        image (array): frame at time k
+        region (tuple, optional): (x0, y0, x1, y1) region of the frame where
+            the features are calculated. Default is None (all the frame)
+    """
+    
+    def __init__(self, image, region=None):
+        self.image = image
+        self.shape = image.shape
+        self.features = {}   # memoized frame-level features
+        
+        # region of the frame where the features are calculated
+        if region is None:
+            region = (0, 0, self.shape[1], self.shape[0])
+        self.region = tuple(int(r) for r in region)
+        self.origin = np.array(self.region[:2])
+        self.roi = image[self.region[1]:self.region[3], self.region[0]:self.region[2]]
+        
+    def memoize(self, key, func):
+        """Returns a frame-level feature, calculating it at the first call.
+        
+        Args:
+            key (hashable): feature identifier
+            func (function): function without arguments calculating the 
+                feature
+        """
+        if key not in self.features:
+            self.features[key] = func()
+        return self.features[key]
+    
+    @property
+    def hsv(self):
+        """Frame in the HSV colorspace."""
+        return self.memoize("hsv", lambda: cv2.cvtColor(self.roi, cv2.COLOR_BGR2HSV))
+    
+    @property
+    def mask(self):
+        """Mask ignoring the weakly (s) or the dim (v) pronounced pixels."""
+        return self.memoize("mask", lambda: cv2.inRange(self.hsv, MASK_LOWER, MASK_UPPER))
+    
+    @property
+    def gray(self):
+        """Frame in gray scale."""
+        return self.memoize("gray", lambda: cv2.cvtColor(self.roi, cv2.COLOR_BGR2GRAY))
+    
+    @property
+    def sobel(self):
+        """Horizontal and vertical Sobel gradients of the gray frame."""
+        return self.memoize("sobel", lambda: (cv2.Sobel(self.gray, cv2.CV_32F, 1, 0),
+                                              cv2.Sobel(self.gray, cv2.CV_32F, 0, 1)))
+    
+    def hsv_bins(self, hsvHistCalc):
+        """HSV histogram bin index of each pixel of the frame.
+        
+        Args:
+            hsvHistCalc (HSVHistogram): image descriptor (3D HSV histogram)
+        """
+        key = ("hsv_bins", tuple(hsvHistCalc.bins))
+        return self.memoize(key, lambda: hsvHistCalc.calc_BinMap(self.roi))
+    
+    def lbp(self, lbpOperator):
+        """LBP codes of the frame.
+        
+        Args:
+            lbpOperator (LBPOperator): LBP operator 
+        """
+        key = ("lbp", lbpOperator.numPoints, lbpOperator.radius, lbpOperator.method)
+        return self.memoize(key, lambda: lbpOperator.compute(self.gray))
+    
+    def gradients(self, hogHistCalc):
+        """Gradient orientation bins and magnitudes of the frame.
+        
+        Args:
+            hogHistCalc (HOGHistogram): image descriptor (HOG histogram)
+        """
+        key = ("gradients", hogHistCalc.n_orient)
+        return self.memoize(key, lambda: hogHistCalc.calc_Gradients(self.gray))
+    
+    def integral_histogram(self, integralHist, binMap, bounds, weights=None):
+        """Integral histogram of a bin index feature of the frame.
+        
+        The integral histogram of the caller is built on the region covered
+        by the bounding boxes, so its buffer is reused across frames. It is 
+        reused by the next calls on the same feature, unless they query 
+        boxes out of it. Then it is built again on the union of both 
+        regions.
+        
+        Args:
+            integralHist (IntegralHistogram): integral histogram to be built
+            binMap (array): bin index of each pixel of the frame region
+            bounds (tuple): (minX, minY, maxX, maxY) bounding boxes to be 
+                queried, as returned by bounds
+            weights (array, optional): weight of each pixel. Default is None
+                (count pixels)
+        """
+        minX, minY, maxX, maxY = bounds
+        region = (minX.min(), minY.min(), maxX.max(), maxY.max())
+        maxCount = np.max((maxX-minX) * (maxY-minY))
+        
+        # the integral histogram may have been built on another frame or
+        # context since the last call, then its source is other feature. 
+        # Counts of 16 bits only hold regions smaller than 2**16 pixels
+        if integralHist.source is binMap:
+            built = integralHist.region
+            if (region[0] >= built[0] and region[1] >= built[1] and 
+                region[2] <= built[2] and region[3] <= built[3] and 
+                (maxCount < 2**16 or integralHist.maxCount >= 2**16)):
+                return integralHist
+            region = (min(region[0], built[0]), min(region[1], built[1]),
+                      max(region[2], built[2]), max(region[3], built[3]))
+            maxCount = max(maxCount, integralHist.maxCount)
+        
+        x0, y0, x1, y1 = region
+        if weights is not None:
+            weights = weights[y0:y1, x0:x1]
+        integralHist.compute(binMap[y0:y1, x0:x1], weights, maxCount, (x0, y0))
+        integralHist.source = binMap
+        return integralHist
+    
+    def pyramid(self, level):
+        """Context of the frame downscaled by 2**level.
+        
+        Args:
+            level (int): number of pyramid levels below the frame
+        """
+        def downscale():
+            # the region is extended to a multiple of the scale, so the 
+            # downscaled pixels are aligned with the downscaled frame ones
+            scale = 2 ** level
+            x0, y0, x1, y1 = self.region
+            x0, y0 = x0 - x0 % scale, y0 - y0 % scale
+            x1 = min(-(-x1 // scale) * scale, self.shape[1])
+            y1 = min(-(-y1 // scale) * scale, self.shape[0])
+            
+            image = self.image[y0:y1, x0:x1]
+            for _ in range(level):
+                image = cv2.pyrDown(image)
+            
+            # the downscaled region keeps its place in the downscaled frame
+            context = FrameContext(image)
+            context.shape = (-(-self.shape[0] // scale), -(-self.shape[1] // scale))
+            context.origin = np.array([x0 // scale, y0 // scale])
+            return context
+        
+        return self.memoize(("pyramid", level), downscale)
+    
+    def bounds(self, particles, s):
+        """Returns the bounding box of each particle on the frame region.
+        
+        Args:
+            particles (array): particles at time k
+            s (int): half of the bounding box width
+        """
+        minX, minY, maxX, maxY = roi_bounds(particles, s, self.shape)
+        
+        # translate the boxes into the region, clipping them to it
+        height, width = self.roi.shape[:2]
+        x0, y0 = self.origin
+        minX = np.clip(minX - x0, 0, width)
+        minY = np.clip(minY - y0, 0, height)
+        maxX = np.clip(maxX - x0, minX, width)
+        maxY = np.clip(maxY - y0, minY, height)
+        
+        return minX, minY, maxX, maxY
+    
+    def contains(self, region):
+        """Checks if a region of the frame is inside the context region.
+        
+        Args:
+            region (tuple): (x0, y0, x1, y1) region of the frame
+        """
+        return (region[0] >= self.region[0] and region[1] >= self.region[1] and 
+                region[2] <= self.region[2] and region[3] <= self.region[3])
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+Histogram normalization and distance metrics computed for a set of 
+histograms at once.
+
+@author: Bessie Domínguez-Dáger
+"""
+
+import numpy as np
+
+def minmax_normalize(hists, alpha=0, beta=255):
+    """Normalize each histogram into the range [alpha, beta].
+    
+    Same as cv2.normalize with cv2.NORM_MINMAX for each row of hists. The
+    rounding of the float32 scaling can leave values slightly out of the
+    range, so they are clipped to it.
+    
+    Args:
+        hists (array): histograms with (N, bins) dimension
+        alpha (float, optional): lower value of the range
+        beta (float, optional): upper value of the range
+        
+    Returns:
+        (array) of normalized histograms with (N, bins) dimension
+    """
+    hists = np.asarray(hists, dtype=np.float32)
+    smin = hists.min(axis=1, keepdims=True).astype(np.float64)
+    smax = hists.max(axis=1, keepdims=True).astype(np.float64)
+    
+    # constant histograms are set to alpha
+    srange = smax - smin
+    scale = (beta - alpha) * np.where(srange > np.finfo(np.float64).eps, 
+                                      1. / np.where(srange > 0, srange, 1), 0)
+    shift = alpha - smin * scale
+    
+    hists = hists * scale.astype(np.float32) + shift.astype(np.float32)
+    
+    return np.clip(hists, min(alpha, beta), max(alpha, beta), out=hists)
+
+def bhattacharyya(hist_ref, hists, sqrt_ref=None):
+    """Bhattacharyya distance between a reference and a set of histograms.
+    
+    Same as cv2.compareHist with cv2.HISTCMP_BHATTACHARYYA for each row 
+    of hists. Negative bins are taken as empty.
+    
+    Args:
+        hist_ref (array): reference histogram with (bins,) dimension
+        hists (array): histograms with (N, bins) dimension
+        sqrt_ref (array, optional): square root of the reference histogram,
+            precomputed for not calculating it in each call
+        
+    Returns:
+        (array) of distances with (N,) dimension
+    """
+    hist_ref = np.asarray(hist_ref, dtype=np.float64)
+    hists = np.maximum(np.asarray(hists, dtype=np.float64), 0.)
+    if sqrt_ref is None:
+        sqrt_ref = np.sqrt(np.maximum(hist_ref, 0.))
+    
+    coef = np.sqrt(hists) @ sqrt_ref
+    s = np.sum(hist_ref) * np.sum(hists, axis=1)
+    scale = np.where(np.abs(s) > np.finfo(np.float32).eps, 
+                     1. / np.sqrt(np.where(s > 0, s, 1)), 1.)
+    
+    return np.sqrt(np.maximum(1. - coef * scale, 0.))
+
+def chi_square(hist_ref, hists):
+    """Chi-Square distance between a reference and a set of histograms.
+    
+    Same as cv2.compareHist with cv2.HISTCMP_CHISQR for each row of hists,
+    where the reference is the first histogram. Bins empty in the 
+    reference histogram are not taken into account.
+    
+    Args:
+        hist_ref (array): reference histogram with (bins,) dimension
+        hists (array): histograms with (N, bins) dimension
+        
+    Returns:
+        (array) of distances with (N,) dimension
+    """
+    hist_ref = np.asarray(hist_ref, dtype=np.float64)
+    hists = np.asarray(hists, dtype=np.float64)
+    
+    valid = np.abs(hist_ref) > np.finfo(np.float64).eps
+    
+    return np.sum((hists[:, valid] - hist_ref[valid])**2 / hist_ref[valid], axis=1)
+
+def chi_square_alt(hist_ref, hists):
+    """Alternative Chi-Square distance between a reference and a set of 
+    histograms.
+    
+    Same as cv2.compareHist with cv2.HISTCMP_CHISQR_ALT for each row of 
+    hists. Bins empty in both histograms are not taken into account.
+    
+    Args:
+        hist_ref (array): reference histogram with (bins,) dimension
+        hists (array): histograms with (N, bins) dimension
+        
+    Returns:
+        (array) of distances with (N,) dimension
+    """
+    hist_ref = np.asarray(hist_ref, dtype=np.float64)
+    hists = np.asarray(hists, dtype=np.float64)
+    
+    num = (hists - hist_ref)**2
+    den = hists + hist_ref
+    valid = den > np.finfo(np.float64).eps
+    
+    return 2 * np.sum(np.where(valid, num / np.where(valid, den, 1), 0), axis=1)
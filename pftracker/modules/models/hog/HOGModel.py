@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+hogModel class defines a gradient orientation model for calculating the 
+likelihoods of particles at actual time k.
+
+@author: Bessie Domínguez-Dáger
+"""
+
+import numpy as np
+from pftracker.modules.models.hog.hoghistogram import HOGHistogram
+from pftracker.modules.models.integralHistogram import IntegralHistogram
+from pftracker.modules.models.referenceBank import ReferenceBank
+
+
+class hogModel():
+    """HOG-based model with integral histograms.
+    
+    The gradient orientations and magnitudes and an integral histogram 
+    weighted by the magnitudes over the region covered by the particles 
+    are calculated once per frame. The HOG histogram of each particle is 
+    read by cells with four lookups per bin. Gradient orientations are 
+    less sensitive to lighting changes than the color and texture cues.
+    
+    Args:
+        hist_ref (array): reference HOG histogram
+        references (ReferenceBank): reference HOG histograms, the first one
+            is hist_ref
+        hogHistCalc (HOGHistogram): image descriptor (HOG histogram)
+        integralHist (IntegralHistogram): integral histogram of the frame, 
+            its buffer is reused across frames
+        N (int): number of particles
+        l (int, optional): lambda Bhattacharyya distance coefficient, higher
+            than in the color model since HOG distances have a smaller range
+        maxReferences (int, optional): maximum number of reference 
+            histograms. Default is 5
+        match (str, optional): distance of each particle to the 
+            references, 'best' or 'soft' as in ReferenceBank. Default is 
+            'best'
+    """
+    def __init__(self, roi, N, l=200, maxReferences=5, match="best"):           
+        self.hogHistCalc = HOGHistogram(n_orient=9, cells=(2, 2))
+        self.hist_ref = self.hogHistCalc.calc_Hist(roi)
+        self.references = ReferenceBank(self.hist_ref, "bhattacharyya", maxReferences, match)
+        self.integralHist = IntegralHistogram(self.hogHistCalc.n_orient)
+        self.N = N
+        self.l = l
+        self.distances = np.zeros((1, self.N))
+        
+    def addReference(self, roi):
+        """Add a reference HOG histogram to the reference bank.
+        
+        Args:
+            roi (array): image of the face from wich to calculate the 
+                reference histogram
+        """
+        self.references.add(self.hogHistCalc.calc_Hist(roi))
+        
+    def calcLikelihood(self, frame, particles, s):    
+        """Calculate the likelihood of each particle.
+        
+        Args:
+            frame (FrameContext): frame at time k and its shared features
+            particles (array): particles at time k
+            s (int): bounding box width
+            
+        Returns:
+            (array) of likelihoods p(z_{k}|x_{k}) with (1,N) dimension
+        """
+        return np.exp(self.calcLogLikelihood(frame, particles, s))
+        
+    def calcLogLikelihood(self, frame, particles, s):    
+        """Calculate the log-likelihood of each particle.
+        
+        This function calcultes the distance between the reference histogram 
+        and the histograms obtained for the actual set of particles at time k.
+        To do this it is used the Bhattacharyya distance metric, which does 
+        not depend on the scale of the gradient magnitudes.
+        
+        Args:
+            frame (FrameContext): frame at time k and its shared features
+            particles (array): particles at time k
+            s (int): bounding box width
+            
+        Returns:
+            (array) of log-likelihoods log p(z_{k}|x_{k}) with (1,N) dimension
+        """
+          
+        s=s//2
+        
+        # set the boundaries of bounding box of each particle on image
+        minX, minY, maxX, maxY = frame.bounds(particles, s)
+        
+        # gradients of the frame and their integral histogram are 
+        # calculated once per frame on the particles region
+        orientation, magnitude = frame.gradients(self.hogHistCalc)
+        integralHist = frame.integral_histogram(self.integralHist, orientation, 
+                                                (minX, minY, maxX, maxY), magnitude)
+        
+        # get the histograms of the cells of all particles
+        cells = self.hogHistCalc.cell_Bounds(minX, minY, maxX, maxY)
+        HOGhists = np.hstack([integralHist.query(*cell) for cell in cells])
+        
+        # calculate histograms distance by Bhattacharyya distance
+        self.distances = self.references.distances(HOGhists).reshape(1, -1)
+    
+        # calculate the log-likelihood  
+        logLikelihood = -self.l*self.distances**2
+        
+        return logLikelihood
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+HOGHistogram creates histograms of oriented gradients (HOG) by cells for
+an image.
+
+@author: Bessie Domínguez-Dáger
+"""
+
+import cv2
+import numpy as np
+
+class HOGHistogram:
+    """Histogram of oriented gradients calculation.
+    
+    The gradient orientations are unsigned (from 0 to 180 degrees) and each 
+    pixel votes with its gradient magnitude. The image is divided in a grid
+    of cells and the histograms of the cells are concatenated.
+    
+    Args:
+        n_orient (int, optional): number of orientation bins. Default is 9
+        cells (tuple, optional): number of cells in rows and columns. 
+            Default is (2, 2)
+    """
+    def __init__(self, n_orient=9, cells=(2, 2)):
+        self.n_orient = n_orient
+        self.cells = cells
+        self.n_bins = n_orient * cells[0] * cells[1]
+        
+    def calc_Gradients(self, gray_image):
+        """
+        Returns the orientation bin and the magnitude of the gradient of each
+        pixel of a gray image.
+        
+        Args:
+            gray_image (array): gray image from wich to calculate the 
+                gradients
+        """
+        gx = cv2.Sobel(gray_image, cv2.CV_32F, 1, 0, ksize=1)
+        gy = cv2.Sobel(gray_image, cv2.CV_32F, 0, 1, ksize=1)
+        magnitude, angle = cv2.cartToPolar(gx, gy, angleInDegrees=True)
+        
+        # unsigned orientation quantized into n_orient bins
+        orientation = (np.mod(angle, 180.) * (self.n_orient / 180.)).astype(np.uint8)
+        np.minimum(orientation, self.n_orient - 1, out=orientation)
+        
+        return orientation, magnitude
+    
+    def cell_Bounds(self, minX, minY, maxX, maxY):
+        """
+        Returns the boundaries of the cells of a set of bounding boxes.
+        
+        Args:
+            minX, minY, maxX, maxY (array): bounding boxes with (N,) dimension
+            
+        Returns:
+            (list) with the (minX, minY, maxX, maxY) boundaries of each cell,
+            in row-major order
+        """
+        rows, cols = self.cells
+        ys = [minY + (maxY - minY) * i // rows for i in range(rows + 1)]
+        xs = [minX + (maxX - minX) * j // cols for j in range(cols + 1)]
+        
+        return [(xs[j], ys[i], xs[j+1], ys[i+1]) 
+                for i in range(rows) for j in range(cols)]
+
+    def calc_Hist(self, image):
+        """
+        Returns the HOG histogram of an image.
+        
+        Args:
+            image (array): image from wich to create the HOG histogram
+        """
+        gray_image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        orientation, magnitude = self.calc_Gradients(gray_image)
+        
+        # histogram of each cell, weighted by the gradient magnitude
+        height, width = gray_image.shape
+        hist = []
+        for x0, y0, x1, y1 in self.cell_Bounds(0, 0, width, height):
+            hist.append(np.bincount(orientation[y0:y1, x0:x1].ravel(), 
+                                    magnitude[y0:y1, x0:x1].ravel(), 
+                                    minlength=self.n_orient))
+        
+        return np.concatenate(hist)
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+IntegralHistogram calculates histograms of rectangular regions of an image
+in constant time.
+
+@author: Bessie Domínguez-Dáger
+"""
+
+import numpy as np
+
+class IntegralHistogram():
+    """Integral histogram of a bin index image.
+    
+    For each bin it is built an integral image (summed-area table) of the
+    pixels falling in that bin, so the histogram of any rectangular region
+    is obtained with four lookups per bin, independently of the region size.
+    
+    Pixel counts are stored as unsigned integers of the narrowest type
+    holding the largest queried region. The cumulative sums may wrap
+    around, but the wrap around cancels in the four lookups. The integral
+    images are written into a buffer reused between calls, and if all the
+    bins do not fit in maxBytes they are built and queried in chunks of
+    bins, so the memory is bounded for large frames. The callers keep in
+    source the bin index image it was last built from.
+    
+    Args:
+        n_bins (int): number of bins of the histogram. Pixels with a bin
+            index greater or equal than n_bins are not counted
+        maxBytes (int, optional): maximum size in bytes of the integral
+            images. Default is 2**28 (256 MB)
+    """
+    
+    def __init__(self, n_bins, maxBytes=2**28):
+        self.n_bins = n_bins
+        self.maxBytes = maxBytes
+        self.bins = np.arange(self.n_bins)
+        self.dtype = np.dtype(np.uint32)
+        self.integral = np.zeros((1, 1, self.n_bins), dtype=self.dtype)
+        self.chunkSize = self.n_bins
+        self.origin = (0, 0)
+        self.region = (0, 0, 0, 0)
+        self.maxCount = 0
+        self.source = None
+        self.buffer = np.empty(0, dtype=np.uint8)
+    
+    def compute(self, binMap, weights=None, maxCount=None, origin=(0, 0)):
+        """
+        Build the integral histogram of a bin index image.
+        
+        Args:
+            binMap (array): bin index of each pixel with (height, width)
+                dimension
+            weights (array, optional): weight of each pixel with
+                (height, width) dimension. Default is None (count pixels)
+            maxCount (int, optional): maximum number of pixels of the
+                queried regions. Default is None (all the pixels of binMap)
+            origin (tuple, optional): (x, y) position of binMap in the 
+                image, the queries are given in image coordinates. Default 
+                is (0, 0)
+        
+        Returns:
+            (IntegralHistogram) the integral histogram itself
+        """
+        height, width = binMap.shape
+        self.origin = tuple(origin)
+        self.region = (origin[0], origin[1], origin[0]+width, origin[1]+height)
+        rows, cols = np.nonzero(binMap < self.n_bins)
+        pixelBins = binMap[rows, cols]
+        
+        # just the bins present on the image are stored, the remaining
+        # ones are empty for any region
+        self.bins, pixelBins = np.unique(pixelBins, return_inverse=True)
+        
+        if weights is None:
+            if maxCount is None:
+                maxCount = height * width
+            self.maxCount = maxCount
+            self.dtype = np.dtype(np.uint16 if maxCount < 2**16 else np.uint32)
+            self.values = 1
+        else:
+            self.dtype = np.dtype(np.float64)
+            self.maxCount = height * width
+            self.values = weights[rows, cols]
+        self.pixels = (rows+1, cols+1, pixelBins.ravel())
+        self.shape = (height+1, width+1)
+        
+        # number of bins of the integral images fitting in maxBytes, all the
+        # bins are built now if they fit, otherwise in each query
+        binBytes = self.shape[0] * self.shape[1] * self.dtype.itemsize
+        self.chunkSize = max(1, self.maxBytes // binBytes)
+        if self.chunkSize >= self.bins.size:
+            self.integral = self.build(0, self.bins.size)
+        else:
+            self.integral = None
+        return self
+    
+    def build(self, start, stop):
+        """
+        Build the integral images of a chunk of the present bins.
+        
+        Args:
+            start (int): first bin of the chunk
+            stop (int): last bin (excluded) of the chunk
+        
+        Returns:
+            (array) of integral images with (height+1, width+1, stop-start)
+            dimension, a view of the buffer
+        """
+        shape = self.shape + (stop - start,)
+        nbytes = shape[0] * shape[1] * shape[2] * self.dtype.itemsize
+        if self.buffer.nbytes < nbytes:
+            self.buffer = np.empty(nbytes, dtype=np.uint8)
+        integral = self.buffer[:nbytes].view(self.dtype).reshape(shape)
+        integral.fill(0)
+        
+        # set each pixel of the chunk into its bin
+        rows, cols, pixelBins = self.pixels
+        inChunk = (pixelBins >= start) & (pixelBins < stop)
+        values = self.values if np.isscalar(self.values) else self.values[inChunk]
+        integral[rows[inChunk], cols[inChunk], pixelBins[inChunk]-start] = values
+        
+        # cumulative sum over rows, adding whole rows which is faster than 
+        # cumsum on the first axis, and over columns
+        for row in range(1, shape[0]):
+            np.add(integral[row], integral[row-1], out=integral[row])
+        np.cumsum(integral, axis=1, dtype=self.dtype, out=integral)
+        return integral
+    
+    def query(self, minX, minY, maxX, maxY):
+        """
+        Returns the histograms of a set of rectangular regions.
+        
+        Args:
+            minX (array): left boundaries with (N,) dimension
+            minY (array): top boundaries with (N,) dimension
+            maxX (array): right boundaries (excluded) with (N,) dimension
+            maxY (array): bottom boundaries (excluded) with (N,) dimension
+        
+        Returns:
+            (array) of histograms with (N, n_bins) dimension
+        """
+        x0, y0 = self.origin
+        minX, minY, maxX, maxY = minX-x0, minY-y0, maxX-x0, maxY-y0
+        dtype = np.float64 if self.dtype.kind == "f" else np.int32
+        hists = np.zeros((np.size(minX), self.n_bins), dtype=dtype)
+        for start in range(0, self.bins.size, self.chunkSize):
+            stop = min(start + self.chunkSize, self.bins.size)
+            I = self.integral if self.integral is not None else self.build(start, stop)
+            hists[:, self.bins[start:stop]] = (I[maxY, maxX] - I[minY, maxX]
+                                               - I[maxY, minX] + I[minY, minX])
+        return hists
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+lbpIntegralModel class defines a LBP model for calculating the likelihoods 
+of particles at actual time k using integral histograms.
+
+@author: Bessie Domínguez-Dáger
+"""
+
+from pftracker.modules.models.lbp.lbphistogram import LBPHistogram
+from pftracker.modules.models.integralHistogram import IntegralHistogram
+from pftracker.modules.models.referenceBank import ReferenceBank
+import numpy as np
+
+
+class lbpIntegralModel():
+    """LBP-based model with integral histograms.
+    
+    The uniform LBP codes are calculated once per frame and an integral 
+    histogram is built over the region covered by the particles, so 
+    the LBP histogram of each particle is read with four lookups per bin.
+    
+    Unlike lbpModel, the codes near the bounding box boundaries are 
+    calculated with the actual neighbour pixels of the frame instead of 
+    the zero padding of each ROI, so the likelihoods are close but not 
+    equal to the ones of lbpModel.
+    
+    Args:
+        hist_ref (array): reference LBP histogram
+        references (ReferenceBank): reference LBP histograms, the first one
+            is hist_ref
+        lbpHistCalc (LBPHistogram): image descriptor (LBP histogram)
+        integralHist (IntegralHistogram): integral histogram of the frame, 
+            its buffer is reused across frames
+        N (int): number of particles
+        sigma (float, optional): standard deviation of the likelihood
+        maxReferences (int, optional): maximum number of reference 
+            histograms. Default is 5
+        match (str, optional): distance of each particle to the 
+            references, 'best' or 'soft' as in ReferenceBank. Default is 
+            'best'
+    """
+    def __init__(self, roi, N, sigma=0.06, maxReferences=5, match="best"):           
+        self.lbpHistCalc = LBPHistogram(numPoints=8, radius=8)
+        self.hist_ref = self.lbpHistCalc.calc_Hist(roi)
+        self.references = ReferenceBank(self.hist_ref, "chi_square_alt", maxReferences, match)
+        self.integralHist = IntegralHistogram(self.lbpHistCalc.n_bins)
+        self.N = N
+        self.sigma = sigma
+        self.distances = np.zeros((1, self.N))
+        
+        # the bounding box size is fixed, so the model is not evaluated on
+        # downscaled frames
+        self.fixedScale = True
+        
+    def addReference(self, roi):
+        """Add a reference LBP histogram to the reference bank.
+        
+        Args:
+            roi (array): image of the face from wich to calculate the 
+                reference histogram
+        """
+        self.references.add(self.lbpHistCalc.calc_Hist(roi))
+        
+    def calcLikelihood(self, frame, particles, s, eps=1e-7):    
+        """Calculate the likelihood of each particle.
+        
+        Args:
+            frame (FrameContext): frame at time k and its shared features
+            particles (array): particles at time k
+            eps (float, optional): minimum for avoiding histogram non defined
+               calculation (division by zero)
+            
+        Returns:
+            (array) of likelihoods p(z_{k}|x_{k}) with (1,N) dimension
+        """
+        return np.exp(self.calcLogLikelihood(frame, particles, s, eps))
+        
+    def calcLogLikelihood(self, frame, particles, s, eps=1e-7):    
+        """Calculate the log-likelihood of each particle.
+        
+        This function calcultes the distance between the reference histogram 
+        and the histograms obtained for the actual set of particles at time k.
+        To do this it is used the Alternative CHI Square distance metric.
+        
+        Args:
+            frame (FrameContext): frame at time k and its shared features
+            particles (array): particles at time k
+            eps (float, optional): minimum for avoiding histogram non defined
+               calculation (division by zero)
+            
+        Returns:
+            (array) of log-likelihoods log p(z_{k}|x_{k}) with (1,N) dimension
+        """
+          
+        # same fixed scale than lbpModel
+        s=20 
+        
+        # set the boundaries of bounding box of each particle on image
+        minX, minY, maxX, maxY = frame.bounds(particles, s)
+        
+        # LBP codes and their integral histogram are calculated once per 
+        # frame on the particles region
+        lbp = frame.lbp(self.lbpHistCalc.lbpOperator)
+        integralHist = frame.integral_histogram(self.integralHist, lbp, 
+                                                (minX, minY, maxX, maxY))
+        
+        # get the histograms of all particles and normalize them
+        LBPhists = integralHist.query(minX, minY, maxX, maxY)
+        LBPhists = LBPhists / (LBPhists.sum(axis=1, keepdims=True) + eps)
+        
+        # calculate Alternative CHI Square distance (use especifically for 
+        # LBP histograms comparison)
+        self.distances = self.references.distances(LBPhists).reshape(1, -1)
+    
+        # calculate the log-likelihood  
+        logLikelihood = (-0.5*np.log(2*np.pi*self.sigma**2) 
+                         - self.distances**2/(2*self.sigma**2))
+        
+        return logLikelihood
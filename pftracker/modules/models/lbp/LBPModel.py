@@ -7,6 +7,8 @@ particles at actual time k.
 """
 
 from pftracker.modules.models.lbp.lbphistogram import LBPHistogram
+from pftracker.modules.models.referenceBank import ReferenceBank
+from pftracker.modules.models.numbaKernels import lbp_histograms, warmup
 import numpy as np
 
 
@@ -15,28 +17,64 @@ class lbpModel():
     
     Args:
         hist_ref (array): reference LBP histogram
+        references (ReferenceBank): reference LBP histograms, the first one
+            is hist_ref
         lbpHistCalc (HSVHistogram): image descriptor (LBP histogram)
         N (int): number of particles
+        maxReferences (int, optional): maximum number of reference 
+            histograms. Default is 5
+        match (str, optional): distance of each particle to the 
+            references, 'best' or 'soft' as in ReferenceBank. Default is 
+            'best'
     """
-    def __init__(self, roi, N):           
+    def __init__(self, roi, N, maxReferences=5, match="best"):           
         self.lbpHistCalc = LBPHistogram(numPoints=8, radius=8) #24,8; 8,4;
         self.hist_ref = self.lbpHistCalc.calc_Hist(roi)
+        self.references = ReferenceBank(self.hist_ref, "chi_square_alt", maxReferences, match)
         self.N = N
         self.distances = np.zeros((1, self.N))
         
-    def calcLikelihood(self, image, particles, s):    
+        # the bounding box size is fixed, so the model is not evaluated on
+        # downscaled frames
+        self.fixedScale = True
+        
+        # compile the kernels before the first frame
+        warmup()
+        
+    def addReference(self, roi):
+        """Add a reference LBP histogram to the reference bank.
+        
+        Args:
+            roi (array): image of the face from wich to calculate the 
+                reference histogram
+        """
+        self.references.add(self.lbpHistCalc.calc_Hist(roi))
+        
+    def calcLikelihood(self, frame, particles, s):    
         """Calculate the likelihood of each particle.
         
+        Args:
+            frame (FrameContext): frame at time k and its shared features
+            particles (array): particles at time k
+            
+        Returns:
+            (array) of likelihoods p(z_{k}|x_{k}) with (1,N) dimension
+        """
+        return np.exp(self.calcLogLikelihood(frame, particles, s))
+        
+    def calcLogLikelihood(self, frame, particles, s):    
+        """Calculate the log-likelihood of each particle.
+        
         This function calcultes the distance between the reference histogram 
         and the histograms obtained for the actual set of particles at time k.
         To do this it is used the Alternative CHI Square distance metric.
         
         Args:
-            image (array): frame at time k
+            frame (FrameContext): frame at time k and its shared features
             particles (array): particles at time k
             
         Returns:
-            (array) of likelihoods p(z_{k}|x_{k}) with (1,N) dimension
+            (array) of log-likelihoods log p(z_{k}|x_{k}) with (1,N) dimension
         """
           
         # Results are better with a fixed scale between 10 and 40,
@@ -44,23 +82,22 @@ class lbpModel():
         s=20 
 #        s=25
         
-        # loop over the particles
-        for iPart in range(self.N):
-            # set the boundaries of bounding box of each particle on image
-            minY = np.around(np.max((particles[1,iPart]-s, 1))).astype(int)
-            maxY = np.around(np.min((particles[1,iPart]+s, image.shape[0]))).astype(int)
-            minX = np.around(np.max((particles[0,iPart]-s, 1))).astype(int)
-            maxX = np.around(np.min((particles[0,iPart]+s, image.shape[1]))).astype(int)
-  
-            roi = image[minY:maxY, minX:maxX, :]
-            LBPhist = self.lbpHistCalc.calc_Hist(roi)
+        # gray frame is calculated once for all the particles
+        grayImage = frame.gray
+        
+        # set the boundaries of bounding box of each particle on image
+        minX, minY, maxX, maxY = frame.bounds(particles, s)
+        
+        # histograms of all the particles, normalized as calc_Hist_Gray
+        LBPhists = lbp_histograms(grayImage, minX, minY, maxX, maxY, 
+                                  self.lbpHistCalc.lbpOperator, self.lbpHistCalc.n_bins)
+        LBPhists /= (LBPhists.sum(axis=1, keepdims=True) + 1e-7)
             
-            # calculate Alternative CHI Square distance (use especifically for 
-            # LBP histograms comparison)
-#            chi_square = np.sum((self.hist_ref - LBPhist)**2 / (self.hist_ref + LBPhist))
-            chi_square = 2 * np.sum((self.hist_ref - LBPhist)**2 / (self.hist_ref + LBPhist))
-#            chi_square = 0.5 * np.sum((self.hist_ref - LBPhist)**2 / (self.hist_ref + LBPhist + 1e-10))
-            self.distances[0, iPart] = chi_square
+        # calculate Alternative CHI Square distance (use especifically for 
+        # LBP histograms comparison)
+#        chi_square = np.sum((self.hist_ref - LBPhist)**2 / (self.hist_ref + LBPhist))
+#        chi_square = 0.5 * np.sum((self.hist_ref - LBPhist)**2 / (self.hist_ref + LBPhist + 1e-10))
+        self.distances = self.references.distances(LBPhists).reshape(1, -1)
     
         # calculate the likelihood  
 #        sigma = 0.05   # 0.01; 0.05; 0.06; 0.08
@@ -69,7 +106,8 @@ class lbpModel():
 #        sigma = 0.01
 #        sigma = 0.008
 #        likelihood = np.exp(-self.distances**2/(2*sigma**2))
-        likelihood = 1/np.sqrt(2*np.pi*sigma**2) * np.exp(-self.distances**2/(2*sigma**2))
+#        likelihood = 1/np.sqrt(2*np.pi*sigma**2) * np.exp(-self.distances**2/(2*sigma**2))
+        logLikelihood = -0.5*np.log(2*np.pi*sigma**2) - self.distances**2/(2*sigma**2)
         
-        return likelihood
+        return logLikelihood
         
\ No newline at end of file
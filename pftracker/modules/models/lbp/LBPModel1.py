@@ -6,9 +6,11 @@ particles at actual time k.
 @author: Bessie Domínguez-Dáger
 """
 
-import cv2
 from pftracker.modules.models.lbp.lbphistogram1 import LBPHistogram
+from pftracker.modules.models.referenceBank import ReferenceBank
+from pftracker.modules.models.numbaKernels import lbp_histograms, warmup
 import numpy as np
+import cv2
 
 
 class lbpModel():
@@ -16,28 +18,66 @@ class lbpModel():
     
     Args:
         hist_ref (array): reference LBP histogram
+        references (ReferenceBank): reference LBP histograms, the first one
+            is hist_ref
         lbpHistCalc (HSVHistogram): image descriptor (LBP histogram)
         N (int): number of particles
+        l (int, optional): lambda Chi-Square distance coefficient
+        maxReferences (int, optional): maximum number of reference 
+            histograms. Default is 5
+        match (str, optional): distance of each particle to the 
+            references, 'best' or 'soft' as in ReferenceBank. Default is 
+            'best'
     """
-    def __init__(self, roi, N):           
+    def __init__(self, roi, N, l=35, maxReferences=5, match="best"):           
         self.lbpHistCalc = LBPHistogram(numPoints=8, radius=8) #24,8; 8,4;
         self.hist_ref = self.lbpHistCalc.calc_Hist(roi)
+        self.references = ReferenceBank(self.hist_ref, "chi_square", maxReferences, match)
         self.N = N
+        self.l = l
         self.distances = np.zeros((1, self.N))
         
-    def calcLikelihood(self, image, particles, s):    
+        # the bounding box size is fixed, so the model is not evaluated on
+        # downscaled frames
+        self.fixedScale = True
+        
+        # compile the kernels before the first frame
+        warmup()
+        
+    def addReference(self, roi):
+        """Add a reference LBP histogram to the reference bank.
+        
+        Args:
+            roi (array): image of the face from wich to calculate the 
+                reference histogram
+        """
+        self.references.add(self.lbpHistCalc.calc_Hist(roi))
+        
+    def calcLikelihood(self, frame, particles, s):    
         """Calculate the likelihood of each particle.
         
+        Args:
+            frame (FrameContext): frame at time k and its shared features
+            particles (array): particles at time k
+            
+        Returns:
+            (array) of likelihoods p(z_{k}|x_{k}) with (1,N) dimension
+        """
+        return np.exp(self.calcLogLikelihood(frame, particles, s))
+        
+    def calcLogLikelihood(self, frame, particles, s):    
+        """Calculate the log-likelihood of each particle.
+        
         This function calcultes the distance between the reference histogram 
         and the histograms obtained for the actual set of particles at time k.
-        To do this it is used the Alternative CHI Square distance metric.
+        To do this it is used the CHI Square distance metric.
         
         Args:
-            image (array): frame at time k
+            frame (FrameContext): frame at time k and its shared features
             particles (array): particles at time k
             
         Returns:
-            (array) of likelihoods p(z_{k}|x_{k}) with (1,N) dimension
+            (array) of log-likelihoods log p(z_{k}|x_{k}) with (1,N) dimension
         """
           
         # Results are better with a fixed scale between 10 and 40,
@@ -45,32 +85,30 @@ class lbpModel():
         s=20 
 #        s=25
         
-        # loop over the particles
-        for iPart in range(self.N):
-            # set the boundaries of bounding box of each particle on image
-            minY = np.around(np.max((particles[1,iPart]-s, 1))).astype(int)
-            maxY = np.around(np.min((particles[1,iPart]+s, image.shape[0]))).astype(int)
-            minX = np.around(np.max((particles[0,iPart]-s, 1))).astype(int)
-            maxX = np.around(np.min((particles[0,iPart]+s, image.shape[1]))).astype(int)
-  
-            roi = image[minY:maxY, minX:maxX, :]
-            LBPhist = self.lbpHistCalc.calc_Hist(roi)
-            
-            #v1
-            # calculate Alternative CHI Square distance (use especifically for 
-            # LBP histograms comparison)
-#            chi_square = np.sum((self.hist_ref - LBPhist)**2 / (self.hist_ref + LBPhist))
-#            chi_square = 2 * np.sum((self.hist_ref - LBPhist)**2 / (self.hist_ref + LBPhist))
-#            chi_square = 0.5 * np.sum((self.hist_ref - LBPhist)**2 / (self.hist_ref + LBPhist + 1e-10))
-#            self.distances[0, iPart] = chi_square
-            
-            #v2
-#            divergence=self.kullback_leibler_divergence(LBPhist, self.hist_ref)
-#            self.distances[0, iPart] = divergence
+        # gray frame is calculated once for all the particles
+        grayImage = frame.gray
+        
+        # set the boundaries of bounding box of each particle on image
+        minX, minY, maxX, maxY = frame.bounds(particles, s)
+        
+        # histograms of all the particles, normalized as calc_Hist_Gray
+        LBPhists = lbp_histograms(grayImage, minX, minY, maxX, maxY, 
+                                  self.lbpHistCalc.lbpOperator, 
+                                  self.lbpHistCalc.n_bins).astype(np.float32)
+        for LBPhist in LBPhists:
+            cv2.normalize(LBPhist, LBPhist)
             
-            #v3
-            chi_square = cv2.compareHist(self.hist_ref, LBPhist, method = cv2.HISTCMP_CHISQR)
-            self.distances[0, iPart] = chi_square
+        #v1
+        # calculate Alternative CHI Square distance (use especifically for 
+        # LBP histograms comparison)
+#        self.distances = chi_square_alt(self.hist_ref, LBPhists).reshape(1, -1)
+        
+        #v2
+#        self.distances = np.array([[self.kullback_leibler_divergence(LBPhist, self.hist_ref)
+#                                    for LBPhist in LBPhists]])
+        
+        #v3
+        self.distances = self.references.distances(LBPhists).reshape(1, -1)
             
         # calculate the likelihood  
 #        sigma = 0.06   # 0.01; 0.05; 0.06; 0.08
@@ -79,10 +117,9 @@ class lbpModel():
 #        sigma = 0.008
 #        likelihood = np.exp(-self.distances**2/(2*sigma**2))
 #        likelihood = 1/np.sqrt(2*np.pi*sigma**2) * np.exp(-self.distances**2/(2*sigma**2))
-        self.l=35
-        likelihood = np.exp(-self.l*self.distances**2)
+        logLikelihood = -self.l*self.distances**2
         
-        return likelihood
+        return logLikelihood
     
     def kullback_leibler_divergence(self, p, q):
         p = np.asarray(p)
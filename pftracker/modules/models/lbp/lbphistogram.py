@@ -6,8 +6,8 @@ Take it from pyimagesearch..........
 
 # import the necessary packages
 import cv2
-from skimage import feature
 import numpy as np
+from pftracker.modules.models.lbp.lbpoperator import LBPOperator
 
 class LBPHistogram:
     """
@@ -21,6 +21,10 @@ class LBPHistogram:
         # store the number of points and radius
         self.numPoints = numPoints
         self.radius = radius 
+        
+        # uniform LBP operator and number of different LBP codes
+        self.lbpOperator = LBPOperator(numPoints, radius, method="uniform")
+        self.n_bins = numPoints + 2
 
     def calc_Hist(self, image, eps=1e-7):
         """
@@ -34,17 +38,52 @@ class LBPHistogram:
         # convert the image to gray scale
         gray_image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
         
+        return self.calc_Hist_Gray(gray_image, eps)
+    
+    def calc_Hist_Gray(self, gray_image, eps=1e-7):
+        """
+        Returns the LBP histogram of an image already in gray scale.
+        
+        Args:
+            gray_image (array): gray image from wich to create the LBP 
+               histogram
+            eps (float, optional): minimum for avoiding histogram non defined
+               calculation (division by zero)
+        """
         # compute the LBP representation of the image         
-        lbp = feature.local_binary_pattern(gray_image, self.numPoints,
-              self.radius, method="uniform")
+        lbp = self.lbpOperator.compute(gray_image)
         
         # build the LBP histogram
-        (hist, _) = np.histogram(lbp.ravel(),
-                    bins=np.arange(0, self.numPoints + 3),
-                    range=(0, self.numPoints + 2))
+        hist = np.bincount(lbp.ravel(), minlength=self.n_bins)
 
         # normalize the histogram
         hist = hist.astype("float")
         hist /= (hist.sum() + eps)
 
-        return hist
\ No newline at end of file
+        return hist
+    
+    def calc_Hists_Gray(self, gray_patches, eps=1e-7):
+        """
+        Returns the LBP histograms of a stack of gray images.
+        
+        Each image gives the same histogram than calc_Hist_Gray.
+        
+        Args:
+            gray_patches (array): gray images with (N, rows, cols) dimension
+            eps (float, optional): minimum for avoiding histogram non defined
+               calculation (division by zero)
+        """
+        # compute the LBP representation of all the images
+        lbp = self.lbpOperator.compute(gray_patches)
+        
+        # build the LBP histograms at once, offsetting the codes of each 
+        # image
+        nImages = lbp.shape[0]
+        codes = lbp.reshape(nImages, -1) + self.n_bins * np.arange(nImages)[:, None]
+        hists = np.bincount(codes.ravel(), minlength=nImages*self.n_bins)
+        hists = hists.reshape(nImages, self.n_bins).astype("float")
+        
+        # normalize the histograms
+        hists /= (hists.sum(axis=1, keepdims=True) + eps)
+        
+        return hists
\ No newline at end of file
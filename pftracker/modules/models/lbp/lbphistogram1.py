@@ -7,8 +7,8 @@ Take it from pyimagesearch..........
 # import the necessary packages
 import cv2
 #from skimage import color 
-from skimage.feature import local_binary_pattern
 import numpy as np
+from pftracker.modules.models.lbp.lbpoperator import LBPOperator
 
 class LBPHistogram:
     """
@@ -22,6 +22,10 @@ class LBPHistogram:
         # store the number of points and radius
         self.numPoints = numPoints
         self.radius = radius 
+        
+        # uniform LBP operator and number of different LBP codes
+        self.lbpOperator = LBPOperator(numPoints, radius, method="uniform")
+        self.n_bins = numPoints + 2
 
     def calc_Hist(self, image, eps=1e-7):
         """
@@ -36,9 +40,20 @@ class LBPHistogram:
         gray_image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
 #        gray_image = color.rgb2gray(image)
         
+        return self.calc_Hist_Gray(gray_image, eps)
+    
+    def calc_Hist_Gray(self, gray_image, eps=1e-7):
+        """
+        Returns the LBP histogram of an image already in gray scale.
+        
+        Args:
+            gray_image (array): gray image from wich to create the LBP 
+               histogram
+            eps (float, optional): minimum for avoiding histogram non defined
+               calculation (division by zero)
+        """
         # compute the LBP representation of the image         
-        lbp = local_binary_pattern(gray_image, self.numPoints,
-              self.radius, method="uniform")
+        lbp = self.lbpOperator.compute(gray_image)
         
         #v1
         # build the LBP histogram
@@ -55,9 +70,10 @@ class LBPHistogram:
 #        hist /= (hist.sum() + eps)   
           
         #v3
-#        lbp = local_binary_pattern(gray_image, 8, 8, method='uniform')
-        img_ku = lbp.astype(np.uint8)
-        hist = cv2.calcHist([img_ku],[0],None,[256],[0,256])
+        # just the bins of the uniform LBP codes are kept, the remaining 
+        # bins of a 256-bin histogram are always empty and do not change
+        # the histogram norm or the distances
+        hist = np.bincount(lbp.ravel(), minlength=self.n_bins).astype(np.float32)
         hist = cv2.normalize(hist,hist).flatten()
 #        hist = cv2.normalize(hist, hist, alpha=0, beta=255, norm_type=cv2.NORM_MINMAX)
 
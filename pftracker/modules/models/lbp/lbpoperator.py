@@ -0,0 +1,154 @@
+"""
+Local Binary Patterns (LBP) operator.
+
+Vectorized implementation of the circular LBP operator, giving the same 
+codes than skimage.feature.local_binary_pattern for the 'default' and 
+'uniform' methods.
+
+@author: Bessie Domínguez-Dáger
+"""
+
+import numpy as np
+from functools import lru_cache
+
+
+@lru_cache(maxsize=32)
+def lbp_sampling(rows, cols, rp, cp, pad):
+    """
+    Bilinear sampling positions and weights of the LBP neighbours.
+    
+    For each neighbour, it contains the rows and columns (in the padded 
+    image) of the pixels used in the interpolation and the interpolation 
+    weights along rows and columns. Positions are given as slices, 
+    since each neighbour is a shifted copy of the image. The weights are 
+    cached by image shape and returned as read-only arrays.
+    
+    Args:
+        rows (int): number of rows of the image
+        cols (int): number of columns of the image
+        rp (tuple): row offsets of the neighbours
+        cp (tuple): column offsets of the neighbours
+        pad (int): zero padding of the image
+    """
+    r = np.arange(rows, dtype=np.float64)
+    c = np.arange(cols, dtype=np.float64)
+    sampling = []
+    for rpi, cpi in zip(rp, cp):
+        # weights are calculated per row and column as in the
+        # bilinear interpolation of each pixel
+        rr = r + rpi
+        cc = c + cpi
+        minr, minc = np.floor(rr), np.floor(cc)
+        dr = (rr - minr)[:, None]
+        dc = (cc - minc)[None, :]
+        
+        # shift of the neighbour with respect to the center pixel
+        sr = int(minr[0]) + pad
+        sc = int(minc[0]) + pad
+        rowSlices = (slice(sr, sr + rows), slice(sr + 1, sr + 1 + rows))
+        colSlices = (slice(sc, sc + cols), slice(sc + 1, sc + 1 + cols))
+        
+        # neighbours at integer positions are not interpolated
+        exact = not (dr.any() or dc.any())
+        rowWeights, colWeights = (1 - dr, dr), (1 - dc, dc)
+        for array in rowWeights + colWeights:
+            array.flags.writeable = False
+        sampling.append((rowSlices, colSlices, rowWeights, colWeights, exact))
+    return sampling
+
+class LBPOperator:
+    """
+    LBP codes calculation.
+    
+    The P neighbours of all the pixels are sampled at once, shifting the 
+    image (or a stack of images) with bilinear interpolation. The sampling 
+    weights are cached for the last image shapes and the binary patterns 
+    are mapped to the LBP codes with a lookup table.
+    
+    Supported methods:
+        - 'default': original binary pattern
+        - 'uniform': rotation invariant uniform patterns, with 
+          numPoints + 2 different codes
+    
+    Args:
+        numPoints (int): number of sampling points
+        radius (int): radius from  the center pixel
+        method (str, optional): LBP method. Default is 'uniform'
+    """
+    def __init__(self, numPoints, radius, method="uniform"):
+        # store the number of points and radius
+        self.numPoints = numPoints
+        self.radius = radius 
+        self.method = method
+        
+        # circular sampling coordinates of the neighbours
+        angles = 2 * np.pi * np.arange(numPoints) / numPoints
+        self.rp = np.round(-radius * np.sin(angles), 5)
+        self.cp = np.round(radius * np.cos(angles), 5)
+        
+        # zero padding for sampling outside the image
+        self.pad = int(np.ceil(radius)) + 1
+        
+        # lookup table from binary patterns to LBP codes
+        patterns = np.arange(2**numPoints)
+        bits = (patterns[:, None] >> np.arange(numPoints)) & 1
+        if method == "uniform":
+            # number of 0-1 changes in the pattern
+            changes = np.sum(bits[:, :-1] != bits[:, 1:], axis=1)
+            self.lut = np.where(changes <= 2, np.sum(bits, axis=1), numPoints + 1)
+        else:
+            self.lut = patterns
+        self.lut = self.lut.astype(np.uint8 if numPoints <= 8 else np.uint32)
+    
+    def sampling(self, rows, cols):
+        """
+        Returns the bilinear sampling positions and weights of the neighbours.
+        
+        Args:
+            rows (int): number of rows of the image
+            cols (int): number of columns of the image
+        """
+        return lbp_sampling(rows, cols, tuple(self.rp), tuple(self.cp), self.pad)
+        
+    def compute(self, image):
+        """
+        Returns the LBP codes of an image or a stack of images.
+        
+        Args:
+            image (array): gray image with (rows, cols) dimension or stack 
+                of gray images with (n_images, rows, cols) dimension
+        """
+        image = np.asarray(image, dtype=np.float64)
+        rows, cols = image.shape[-2:]
+        if image.size == 0:
+            return np.zeros(image.shape, dtype=self.lut.dtype)
+        
+        # zero padding of each image
+        p = self.pad
+        padded = np.zeros(image.shape[:-2] + (rows + 2*p, cols + 2*p))
+        padded[..., p:p+rows, p:p+cols] = image
+        
+        # compare the interpolated neighbours with the center pixels and
+        # build the binary pattern
+        dtype = np.uint8 if self.numPoints <= 8 else np.uint32
+        pattern = np.zeros(image.shape, dtype=dtype)
+        sign = np.empty(image.shape, dtype=dtype)
+        top, bottom, tmp = (np.empty(image.shape) for _ in range(3))
+        for i, ((r0, r1), (c0, c1), (wr0, wr1), (wc0, wc1), exact) in \
+                enumerate(self.sampling(rows, cols)):
+            if exact:
+                texture = padded[..., r0, c0]
+            else:
+                # bilinear interpolation, top and bottom rows first
+                np.multiply(padded[..., r0, c0], wc0, out=top)
+                top += np.multiply(padded[..., r0, c1], wc1, out=tmp)
+                np.multiply(padded[..., r1, c0], wc0, out=bottom)
+                bottom += np.multiply(padded[..., r1, c1], wc1, out=tmp)
+                top *= wr0
+                bottom *= wr1
+                texture = np.add(top, bottom, out=top)
+            np.greater_equal(np.subtract(texture, image, out=tmp), 0, out=sign)
+            sign <<= i
+            pattern |= sign
+            
+        return self.lut[pattern]
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+fusedModel class defines a multi-cue model for calculating the likelihoods 
+of particles at actual time k combining color and texture.
+
+@author: Bessie Domínguez-Dáger
+"""
+
+import numpy as np
+from pftracker.modules.models.colorhist.HSVModel import hsvModel
+from pftracker.modules.models.lbp.LBPIntegralModel import lbpIntegralModel
+
+
+class fusedModel():
+    """HSV color and LBP texture fused model.
+    
+    All the cues are evaluated in the same pass over the particles, sharing
+    the frame-level features of the FrameContext. The log-likelihoods of the
+    cues are combined as a weighted sum, this is the likelihoods are 
+    multiplied as independent observations.
+    
+    Optionally, the cues after the first one (the cheapest) are evaluated 
+    only for the best ranked particles by the first cue. The rest of the 
+    particles take the lowest log-likelihood obtained by those cues.
+    
+    Args:
+        cues (list): observation models of each cue, cheapest first
+        weights (list, optional): weight of the log-likelihood of each cue.
+            Default is 1 for all of them
+        gatePercent (int, optional): percent of the particles, ranked by the 
+            first cue, where the remaining cues are evaluated. Default is 
+            None (all the particles)
+        N (int): number of particles
+    """
+    
+    def __init__(self, roi, N, cues=(hsvModel, lbpIntegralModel), weights=None,
+                 gatePercent=None):
+        self.cues = [cue(roi, N) for cue in cues]
+        self.weights = [1.]*len(self.cues) if weights is None else list(weights)
+        self.gatePercent = gatePercent
+        self.N = N
+        
+        # fixed bounding box size if any of the cues has it
+        self.fixedScale = any(getattr(cue, "fixedScale", False) for cue in self.cues)
+        
+    def addReference(self, roi):
+        """Add a reference to the reference bank of each cue.
+        
+        Args:
+            roi (array): image of the face from wich to calculate the 
+                references
+        """
+        for cue in self.cues:
+            cue.addReference(roi)
+        
+    def calcLikelihood(self, frame, particles, s):
+        """Calculate the likelihood of each particle.
+        
+        Args:
+            frame (FrameContext): frame at time k and its shared features
+            particles (array): particles at time k
+            s (int): bounding box width
+            
+        Returns:
+            (array) of likelihoods p(z_{k}|x_{k}) with (1,N) dimension
+        """
+        return np.exp(self.calcLogLikelihood(frame, particles, s))
+        
+    def calcLogLikelihood(self, frame, particles, s):
+        """Calculate the log-likelihood of each particle.
+        
+        Args:
+            frame (FrameContext): frame at time k and its shared features
+            particles (array): particles at time k
+            s (int): bounding box width
+            
+        Returns:
+            (array) of log-likelihoods log p(z_{k}|x_{k}) with (1,N) dimension
+        """
+        
+        # evaluate the first cue on all the particles
+        logLikelihood = self.weights[0] * self.cues[0].calcLogLikelihood(frame, particles, s)
+        
+        # select the particles where to evaluate the remaining cues
+        nPart = particles.shape[1]
+        if self.gatePercent is None:
+            idx = np.arange(nPart)
+        else:
+            nGate = int(np.clip(round(self.gatePercent * nPart/100), 1, nPart))
+            idx = np.argpartition(-logLikelihood[0], nGate-1)[:nGate]
+            
+        for cue, weight in zip(self.cues[1:], self.weights[1:]):
+            cueLogLikelihood = cue.calcLogLikelihood(frame, particles[:, idx], s)
+            
+            # particles discarded by the gate take the lowest log-likelihood
+            fullLogLikelihood = np.full((1, nPart), cueLogLikelihood.min())
+            fullLogLikelihood[:, idx] = cueLogLikelihood
+            
+            logLikelihood += weight * fullLogLikelihood
+        
+        return logLikelihood
@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+"""
+Compiled kernels for the per-particle work of the observation models.
+
+The kernels are compiled with Numba when it is installed, otherwise the
+same computations are done with NumPy.
+
+@author: Bessie Domínguez-Dáger
+"""
+
+import numpy as np
+from pftracker.modules.models.histDistances import minmax_normalize, bhattacharyya
+from pftracker.modules.models.particleROI import extract_patches
+
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+if NUMBA_AVAILABLE:
+    
+    @njit(parallel=True, cache=True)
+    def _roi_histograms(binMap, minX, minY, maxX, maxY, n_bins):
+        nPart = minX.shape[0]
+        hists = np.zeros((nPart, n_bins), dtype=np.float32)
+        for i in prange(nPart):
+            for y in range(minY[i], maxY[i]):
+                for x in range(minX[i], maxX[i]):
+                    b = binMap[y, x]
+                    if b < n_bins:
+                        hists[i, b] += 1
+        return hists
+    
+    @njit(parallel=True, cache=True)
+    def _kernel_histograms(binMap, top, left, minX, minY, maxX, maxY, kernel, n_bins):
+        nPart = minX.shape[0]
+        height, width = kernel.shape
+        hists = np.zeros((nPart, n_bins), dtype=np.float32)
+        for i in prange(nPart):
+            counts = np.zeros(n_bins)
+            for r in range(height):
+                y = top[i] + r
+                if y < minY[i] or y >= maxY[i]:
+                    continue
+                for c in range(width):
+                    x = left[i] + c
+                    if x < minX[i] or x >= maxX[i]:
+                        continue
+                    b = binMap[y, x]
+                    if b < n_bins:
+                        counts[b] += kernel[r, c]
+            for b in range(n_bins):
+                hists[i, b] = counts[b]
+        return hists
+    
+    @njit(parallel=True, cache=True)
+    def _lbp_histograms(gray, minX, minY, maxX, maxY, rp, cp, pad, lut, n_bins):
+        nPart = minX.shape[0]
+        nPoints = rp.shape[0]
+        hists = np.zeros((nPart, n_bins))
+        for i in prange(nPart):
+            rows = maxY[i] - minY[i]
+            cols = maxX[i] - minX[i]
+            
+            # zero padding of the ROI as in LBPOperator
+            padded = np.zeros((rows + 2*pad, cols + 2*pad))
+            for r in range(rows):
+                for c in range(cols):
+                    padded[r+pad, c+pad] = gray[minY[i]+r, minX[i]+c]
+            
+            # compare the interpolated neighbours with the center pixels and
+            # build the binary pattern
+            pattern = np.zeros((rows, cols), dtype=np.int64)
+            dc = np.empty(cols)
+            for p in range(nPoints):
+                sr = int(np.floor(rp[p])) + pad
+                sc = int(np.floor(cp[p])) + pad
+                for c in range(cols):
+                    dc[c] = (c + cp[p]) - np.floor(c + cp[p])
+                for r in range(rows):
+                    dr = (r + rp[p]) - np.floor(r + rp[p])
+                    for c in range(cols):
+                        top = padded[sr+r, sc+c] * (1 - dc[c]) + padded[sr+r, sc+c+1] * dc[c]
+                        bottom = (padded[sr+r+1, sc+c] * (1 - dc[c]) 
+                                  + padded[sr+r+1, sc+c+1] * dc[c])
+                        texture = top * (1 - dr) + bottom * dr
+                        if texture - padded[r+pad, c+pad] >= 0:
+                            pattern[r, c] |= 1 << p
+            
+            for r in range(rows):
+                for c in range(cols):
+                    hists[i, lut[pattern[r, c]]] += 1
+        return hists
+    
+    @njit(parallel=True, cache=True)
+    def _bhattacharyya_minmax(hists, sum_ref, sqrt_ref, alpha, beta):
+        nPart, n_bins = hists.shape
+        distances = np.empty(nPart)
+        for i in prange(nPart):
+            # normalize the histogram into [alpha, beta] as cv2.NORM_MINMAX
+            smin = hists[i, 0]
+            smax = hists[i, 0]
+            for b in range(1, n_bins):
+                smin = min(smin, hists[i, b])
+                smax = max(smax, hists[i, b])
+            srange = np.float64(smax) - np.float64(smin)
+            scale = 0.
+            if srange > np.finfo(np.float64).eps:
+                scale = (beta - alpha) * (1. / srange)
+            shift = alpha - np.float64(smin) * scale
+            scale32 = np.float32(scale)
+            shift32 = np.float32(shift)
+            
+            # Bhattacharyya distance as cv2.HISTCMP_BHATTACHARYYA, the 
+            # bins rounded below alpha are clipped as in minmax_normalize
+            coef = 0.
+            s = 0.
+            for b in range(n_bins):
+                h = np.float64(hists[i, b] * scale32 + shift32)
+                h = min(max(h, min(alpha, beta)), max(alpha, beta))
+                coef += np.sqrt(h) * sqrt_ref[b]
+                s += h
+            s *= sum_ref
+            if abs(s) > np.finfo(np.float32).eps:
+                coef /= np.sqrt(s)
+            distances[i] = np.sqrt(max(1. - coef, 0.))
+        return distances
+
+
+def roi_histograms(binMap, minX, minY, maxX, maxY, n_bins):
+    """Histograms of the bin indexes inside each bounding box.
+    
+    Args:
+        binMap (array): bin index of each pixel, pixels with index greater 
+            or equal to n_bins are ignored
+        minX, minY, maxX, maxY (array): bounding boxes with (N,) dimension
+        n_bins (int): number of bins of the histograms
+        
+    Returns:
+        (array) of float32 histograms with (N, n_bins) dimension
+    """
+    if NUMBA_AVAILABLE:
+        return _roi_histograms(binMap, minX, minY, maxX, maxY, n_bins)
+    
+    hists = np.empty((minX.shape[0], n_bins), dtype=np.float32)
+    for i in range(minX.shape[0]):
+        roi = binMap[minY[i]:maxY[i], minX[i]:maxX[i]].ravel()
+        hists[i] = np.bincount(roi, minlength=n_bins+1)[:n_bins]
+    return hists
+
+def kernel_histograms(binMap, top, left, minX, minY, maxX, maxY, kernel, n_bins):
+    """Kernel weighted histograms of the bin indexes inside each bounding 
+    box.
+    
+    The kernel is placed at (top, left) for each particle and only the
+    pixels inside the clipped bounding box take its weights. The histograms
+    are accumulated one particle at a time, so the memory does not grow 
+    with the number of particles.
+    
+    Args:
+        binMap (array): bin index of each pixel, pixels with index greater 
+            or equal to n_bins are ignored
+        top, left (array): position of the kernel with (N,) dimension
+        minX, minY, maxX, maxY (array): bounding boxes with (N,) dimension
+        kernel (array): pixel weights with (height, width) dimension
+        n_bins (int): number of bins of the histograms
+        
+    Returns:
+        (array) of float32 histograms with (N, n_bins) dimension
+    """
+    if NUMBA_AVAILABLE:
+        return _kernel_histograms(binMap, top, left, minX, minY, maxX, maxY, 
+                                  kernel, n_bins)
+    
+    height, width = kernel.shape
+    hists = np.empty((minX.shape[0], n_bins), dtype=np.float32)
+    for i in range(minX.shape[0]):
+        y0, x0 = max(minY[i], top[i]), max(minX[i], left[i])
+        y1 = max(min(maxY[i], top[i]+height), y0)
+        x1 = max(min(maxX[i], left[i]+width), x0)
+        roi = binMap[y0:y1, x0:x1].ravel()
+        weights = kernel[y0-top[i]:y1-top[i], x0-left[i]:x1-left[i]].ravel()
+        hists[i] = np.bincount(roi, weights, minlength=n_bins+1)[:n_bins]
+    return hists
+
+def lbp_histograms(grayImage, minX, minY, maxX, maxY, lbpOperator, n_bins):
+    """Histograms of the LBP codes of the bounding boxes.
+    
+    The codes of each bounding box are the ones of LBPOperator.compute on
+    its ROI, with the zero padding of the ROI for the neighbours out of the
+    box.
+    
+    Args:
+        grayImage (array): gray image
+        minX, minY, maxX, maxY (array): bounding boxes with (N,) dimension
+        lbpOperator (LBPOperator): LBP codes calculation
+        n_bins (int): number of bins of the histograms
+        
+    Returns:
+        (array) of code counts with (N, n_bins) dimension
+    """
+    if NUMBA_AVAILABLE:
+        return _lbp_histograms(grayImage, minX, minY, maxX, maxY, lbpOperator.rp, 
+                               lbpOperator.cp, lbpOperator.pad, lbpOperator.lut,
+                               n_bins)
+    
+    # codes of the full size bounding boxes are calculated at once over 
+    # the stack of patches
+    nPart = minX.shape[0]
+    hists = np.empty((nPart, n_bins))
+    width, height = np.max(maxX - minX, initial=0), np.max(maxY - minY, initial=0)
+    full = ((maxX - minX) == width) & ((maxY - minY) == height)
+    if full.any():
+        lbp = lbpOperator.compute(extract_patches(grayImage, minX[full], minY[full], 
+                                                  height, width))
+        codes = lbp.reshape(lbp.shape[0], -1) + n_bins * np.arange(lbp.shape[0])[:, None]
+        hists[full] = np.bincount(codes.ravel(), minlength=lbp.shape[0]*n_bins
+                                  ).reshape(-1, n_bins)
+    
+    # loop over the bounding boxes clipped by the image
+    for i in np.flatnonzero(~full):
+        lbp = lbpOperator.compute(grayImage[minY[i]:maxY[i], minX[i]:maxX[i]])
+        hists[i] = np.bincount(lbp.ravel(), minlength=n_bins)
+    return hists
+
+def bhattacharyya_minmax(hist_ref, hists, sqrt_ref, alpha=0, beta=255):
+    """Bhattacharyya distances of the histograms normalized into the range
+    [alpha, beta].
+    
+    Same as minmax_normalize followed by bhattacharyya, without building
+    the normalized histograms.
+    
+    Args:
+        hist_ref (array): reference histogram with (bins,) dimension
+        hists (array): histograms with (N, bins) dimension
+        sqrt_ref (array): square root of the reference histogram
+        alpha (float, optional): lower value of the range
+        beta (float, optional): upper value of the range
+        
+    Returns:
+        (array) of distances with (N,) dimension
+    """
+    if NUMBA_AVAILABLE:
+        sum_ref = float(np.sum(np.asarray(hist_ref, dtype=np.float64)))
+        return _bhattacharyya_minmax(np.asarray(hists, dtype=np.float32), sum_ref,
+                                     np.asarray(sqrt_ref, dtype=np.float64),
+                                     float(alpha), float(beta))
+    
+    hists = minmax_normalize(hists, alpha=alpha, beta=beta)
+    return bhattacharyya(hist_ref, hists, sqrt_ref)
+
+def warmup():
+    """Compile the kernels ahead of the first frame.
+    
+    Kernels are compiled for the argument types used by the observation
+    models. With the compilation cache this only loads them from disk 
+    after the first run.
+    """
+    if not NUMBA_AVAILABLE:
+        return
+    
+    binMap = np.zeros((2, 2), dtype=np.uint16)
+    bounds = np.zeros(1, dtype=int)
+    hists = roi_histograms(binMap, bounds, bounds, bounds+2, bounds+2, 2)
+    kernel_histograms(binMap, bounds, bounds, bounds, bounds, bounds+2, bounds+2,
+                      np.ones((2, 2), dtype=np.float32), 2)
+    bhattacharyya_minmax(np.ones(2, dtype=np.float32), hists, np.ones(2))
+    _lbp_histograms(binMap.astype(np.uint8), bounds, bounds, bounds+2, bounds+2,
+                    np.zeros(1), np.zeros(1), 1, np.zeros(2, dtype=np.uint8), 2)
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+Bounding boxes of the particles on the image.
+
+@author: Bessie Domínguez-Dáger
+"""
+
+import numpy as np
+
+def roi_bounds(particles, s, shape):
+    """Calculate the bounding box of each particle on image.
+    
+    Boxes are centered at the (x, y) position of the particles and clipped
+    to the image, as done by the observation models for each particle. 
+    Boxes of particles lying outside the image are returned empty.
+    
+    Args:
+        particles (array): particles at time k with (size_v, N) dimension
+        s (int): half of the bounding box width
+        shape (tuple): image shape
+        
+    Returns:
+        4-element tuple containing
+        
+        - **minX** (*array*): left boundaries with (N,) dimension
+        - **minY** (*array*): top boundaries with (N,) dimension
+        - **maxX** (*array*): right boundaries with (N,) dimension
+        - **maxY** (*array*): bottom boundaries with (N,) dimension
+    """
+    
+    height, width = shape[0], shape[1]
+    
+    # set the boundaries of bounding box of each particle on image
+    minY = np.around(np.maximum(particles[1, :] - s, 1)).astype(int)
+    maxY = np.around(np.minimum(particles[1, :] + s, height)).astype(int)
+    minX = np.around(np.maximum(particles[0, :] - s, 1)).astype(int)
+    maxX = np.around(np.minimum(particles[0, :] + s, width)).astype(int)
+    
+    # keep boxes inside the image, empty boxes for out-of-bounds particles
+    minY = np.clip(minY, 0, height)
+    minX = np.clip(minX, 0, width)
+    maxY = np.clip(maxY, minY, height)
+    maxX = np.clip(maxX, minX, width)
+    
+    return minX, minY, maxX, maxY
+
+def roi_grid(minX, minY, maxX, maxY, gridSize):
+    """Sample a fixed grid of pixels inside each bounding box.
+    
+    The grid points are placed at the centers of gridSize x gridSize 
+    equal cells of each box, as in a nearest-neighbour resize of the box. 
+    
+    Args:
+        minX, minY, maxX, maxY (array): bounding boxes with (N,) dimension
+        gridSize (int): number of grid points in each direction
+        
+    Returns:
+        3-element tuple containing
+        
+        - **rows** (*array*): rows of the grid points with (N, gridSize, 1) 
+          dimension
+        - **cols** (*array*): columns of the grid points with 
+          (N, 1, gridSize) dimension
+        - **valid** (*array*): boxes with at least one pixel, with (N,) 
+          dimension
+    """
+    
+    steps = (np.arange(gridSize) + 0.5) / gridSize
+    rows = minY[:, None] + (steps * (maxY - minY)[:, None]).astype(int)
+    cols = minX[:, None] + (steps * (maxX - minX)[:, None]).astype(int)
+    valid = (maxY > minY) & (maxX > minX)
+    
+    return rows[:, :, None], cols[:, None, :], valid
+
+def extract_patches(image, minX, minY, h, w, borderValue=0):
+    """Extract fixed-size patches of an image at once.
+    
+    The patches are gathered from a strided view of the image, so a single 
+    copy builds the contiguous array of all of them. Pixels of the patches
+    falling outside the image are set to borderValue.
+    
+    Args:
+        image (array): image with (height, width) or (height, width, C) 
+            dimension
+        minX (array): left boundaries of the patches with (N,) dimension
+        minY (array): top boundaries of the patches with (N,) dimension
+        h (int): height of the patches
+        w (int): width of the patches
+        borderValue (scalar, optional): value of the pixels outside the 
+            image. Default is 0
+        
+    Returns:
+        (array) of patches with (N, h, w) or (N, h, w, C) dimension
+    """
+    
+    minX = np.asarray(minX, dtype=int)
+    minY = np.asarray(minY, dtype=int)
+    height, width = image.shape[:2]
+    
+    # pad the image just when some patch crosses its borders
+    top = max(0, -minY.min(initial=0))
+    left = max(0, -minX.min(initial=0))
+    bottom = max(0, (minY + h).max(initial=0) - height)
+    right = max(0, (minX + w).max(initial=0) - width)
+    if top or left or bottom or right:
+        padding = ((top, bottom), (left, right)) + ((0, 0),) * (image.ndim - 2)
+        image = np.pad(image, padding, constant_values=borderValue)
+        minX, minY = minX + left, minY + top
+        
+    # sliding windows view with (height-h+1, width-w+1, [C,] h, w) dimension
+    windows = np.lib.stride_tricks.sliding_window_view(image, (h, w), axis=(0, 1))
+    patches = windows[minY, minX]
+    if image.ndim == 3:
+        patches = np.moveaxis(patches, 1, -1)
+    
+    return np.ascontiguousarray(patches)
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+ReferenceBank class holds the reference histograms of an observation model.
+
+@author: Bessie Domínguez-Dáger
+"""
+
+import numpy as np
+from pftracker.modules.models.histDistances import bhattacharyya, chi_square, chi_square_alt
+
+
+class ReferenceBank():
+    """Bank of reference histograms.
+    
+    The references are kept as a (K, bins) matrix, so the histograms of 
+    all the particles are compared with all the references at once. For the
+    Bhattacharyya distance the square-rooted references are stored and the
+    coefficients are a single matrix product. Each particle keeps the 
+    distance to its best matching reference, or a soft minimum of the 
+    distances to all of them.
+    
+    The bank has a bounded size. When it is full, the reference that has
+    not been the best match for the longest time is evicted. The first 
+    reference (from the face detection) is never evicted.
+    
+    Args:
+        hist_ref (array): first reference histogram
+        metric (str, optional): histogram distance, 'bhattacharyya', 
+            'chi_square' or 'chi_square_alt'. Default is 'bhattacharyya'
+        maxSize (int, optional): maximum number of references. Default is 5
+        match (str, optional): distance of each particle, 'best' for the 
+            minimum distance over the references or 'soft' for their soft 
+            minimum. Default is 'best'
+        tau (float, optional): temperature of the soft minimum
+    """
+    
+    def __init__(self, hist_ref, metric="bhattacharyya", maxSize=5, match="best", 
+                 tau=0.05):
+        self.metric = metric
+        self.maxSize = maxSize
+        self.match = match
+        self.tau = tau
+        
+        hist_ref = np.asarray(hist_ref, dtype=np.float64).ravel()
+        self.hists = hist_ref[None, :]
+        self.sqrt_hists = np.sqrt(self.hists)
+        self.sums = self.hists.sum(axis=1)
+        
+        # last scoring step where each reference was the best match 
+        self.step = 0
+        self.lastUsed = np.zeros(1, dtype=int)
+        
+    def __len__(self):
+        return self.hists.shape[0]
+        
+    def add(self, hist):
+        """Add a reference histogram, evicting the least recently used one
+        if the bank is full.
+        
+        Args:
+            hist (array): reference histogram with (bins,) dimension
+        """
+        hist = np.asarray(hist, dtype=np.float64).ravel()
+        
+        keep = np.arange(len(self))
+        if len(self) >= self.maxSize:
+            evicted = 1 + np.argmin(self.lastUsed[1:])
+            keep = keep[keep != evicted]
+            
+        self.hists = np.vstack((self.hists[keep], hist))
+        self.sqrt_hists = np.vstack((self.sqrt_hists[keep], np.sqrt(hist)))
+        self.sums = np.append(self.sums[keep], hist.sum())
+        self.lastUsed = np.append(self.lastUsed[keep], self.step)
+        
+    def distances(self, hists):
+        """Distance of each histogram to the references.
+        
+        Args:
+            hists (array): histograms with (N, bins) dimension
+            
+        Returns:
+            (array) of distances with (N,) dimension
+        """
+        
+        # a single reference is compared as in the one-reference models
+        if len(self) == 1:
+            if self.metric == "bhattacharyya":
+                return bhattacharyya(self.hists[0], hists, self.sqrt_hists[0])
+            if self.metric == "chi_square":
+                return chi_square(self.hists[0], hists)
+            return chi_square_alt(self.hists[0], hists)
+        
+        hists = np.asarray(hists, dtype=np.float64)
+        if self.metric == "bhattacharyya":
+            # Bhattacharyya coefficients of all the pairs at once
+            coef = np.sqrt(hists) @ self.sqrt_hists.T
+            s = hists.sum(axis=1)[:, None] * self.sums[None, :]
+            scale = np.where(np.abs(s) > np.finfo(np.float32).eps, 
+                             1. / np.sqrt(np.where(s > 0, s, 1)), 1.)
+            distances = np.sqrt(np.maximum(1. - coef * scale, 0.))
+        elif self.metric == "chi_square":
+            # the empty bins of each reference are different
+            distances = np.stack([chi_square(hist, hists) for hist in self.hists], axis=1)
+        else:
+            num = (hists[:, None, :] - self.hists[None, :, :])**2
+            den = hists[:, None, :] + self.hists[None, :, :]
+            valid = den > np.finfo(np.float64).eps
+            distances = 2 * np.sum(np.where(valid, num / np.where(valid, den, 1), 0), axis=2)
+        
+        return self.select(distances)
+        
+    def select(self, distances):
+        """Distance of each particle from its distances to the references.
+        
+        Args:
+            distances (array): distances with (N, K) dimension
+            
+        Returns:
+            (array) of distances with (N,) dimension
+        """
+        
+        # update the references used as best match
+        self.step += 1
+        self.lastUsed[np.unique(np.argmin(distances, axis=1))] = self.step
+        
+        dmin = distances.min(axis=1)
+        if self.match == "best":
+            return dmin
+        
+        # soft minimum, between the minimum and the mean distance
+        soft = np.mean(np.exp(-(distances - dmin[:, None]) / self.tau), axis=1)
+        return dmin - self.tau * np.log(soft)
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+templateModel class defines a template correlation model for calculating 
+the likelihoods of particles at actual time k.
+
+@author: Bessie Domínguez-Dáger
+"""
+
+import cv2
+import numpy as np
+from functools import lru_cache
+
+
+class templateModel():
+    """Gray template correlation model.
+    
+    It keeps a gray template of the face from the first frame detection. 
+    Each frame the template, scaled to the bounding box width, is matched 
+    once over the frame region with cv2.matchTemplate. The response of each
+    particle is read from the correlation map at its (x, y) position with 
+    bilinear interpolation, so scoring all the particles is a single 
+    gather.
+    
+    Args:
+        template (array): gray template of the face
+        N (int): number of particles
+        method (int, optional): cv2.matchTemplate normalized correlation 
+            method. Default is cv2.TM_CCOEFF_NORMED
+        l (int, optional): lambda coefficient of the likelihood
+    """
+    def __init__(self, roi, N, method=cv2.TM_CCOEFF_NORMED, l=50):
+        self.template = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
+        self.method = method
+        self.N = N
+        self.l = l
+        self.distances = np.zeros((1, self.N))
+        
+        # templates scaled to the last bounding box widths
+        self.scaledTemplate = lru_cache(maxsize=16)(self.scaleTemplate)
+        
+    def addReference(self, roi):
+        """Replace the face template.
+        
+        Args:
+            roi (array): image of the face
+        """
+        self.template = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
+        self.scaledTemplate.cache_clear()
+        
+    def scaleTemplate(self, s):
+        """Template scaled to a bounding box width.
+        
+        The scaled templates are cached for the last widths by 
+        scaledTemplate and returned as read-only arrays.
+        
+        Args:
+            s (int): bounding box width
+        """
+        template = cv2.resize(self.template, (s, s), interpolation=cv2.INTER_AREA)
+        template.flags.writeable = False
+        return template
+        
+    def calcLikelihood(self, frame, particles, s):    
+        """Calculate the likelihood of each particle.
+        
+        Args:
+            frame (FrameContext): frame at time k and its shared features
+            particles (array): particles at time k
+            s (int): bounding box width
+            
+        Returns:
+            (array) of likelihoods p(z_{k}|x_{k}) with (1,N) dimension
+        """
+        return np.exp(self.calcLogLikelihood(frame, particles, s))
+        
+    def calcLogLikelihood(self, frame, particles, s):    
+        """Calculate the log-likelihood of each particle.
+        
+        The distance of each particle is (1 - r)/2, where r is the 
+        normalized correlation of the template centered at the particle.
+        
+        Args:
+            frame (FrameContext): frame at time k and its shared features
+            particles (array): particles at time k
+            s (int): bounding box width
+            
+        Returns:
+            (array) of log-likelihoods log p(z_{k}|x_{k}) with (1,N) dimension
+        """
+        
+        s = max(int(s), 1)
+        template = self.scaledTemplate(s)
+        
+        # correlation map of the template over the frame region, 
+        # calculated once per frame and scale
+        def correlation():
+            gray = frame.gray
+            if gray.shape[0] < s or gray.shape[1] < s:
+                return np.full((1, 1), -1., dtype=np.float32)
+            return cv2.matchTemplate(gray, template, self.method)
+        response = frame.memoize(("template", id(self), s), correlation)
+        height, width = response.shape
+        
+        # position of each particle in the correlation map, whose pixels
+        # are the template top-left corners
+        x0, y0 = frame.origin
+        x = particles[0, :] - x0 - (s - 1) / 2.
+        y = particles[1, :] - y0 - (s - 1) / 2.
+        inside = (x >= 0) & (x <= width - 1) & (y >= 0) & (y <= height - 1)
+        x = np.clip(x, 0, width - 1)
+        y = np.clip(y, 0, height - 1)
+        
+        # bilinear interpolation of the correlation map
+        c0 = np.minimum(np.floor(x).astype(int), width - 2) if width > 1 else np.zeros(x.shape, int)
+        r0 = np.minimum(np.floor(y).astype(int), height - 2) if height > 1 else np.zeros(y.shape, int)
+        c1 = np.minimum(c0 + 1, width - 1)
+        r1 = np.minimum(r0 + 1, height - 1)
+        dc, dr = x - c0, y - r0
+        r = ((1 - dr) * ((1 - dc) * response[r0, c0] + dc * response[r0, c1]) 
+             + dr * ((1 - dc) * response[r1, c0] + dc * response[r1, c1]))
+        
+        # particles whose template falls outside the frame do not match
+        r = np.where(inside, r, -1.)
+        self.distances = ((1. - r) / 2.).reshape(1, -1)
+    
+        # calculate the log-likelihood  
+        logLikelihood = -self.l*self.distances**2
+        
+        return logLikelihood
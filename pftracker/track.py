@@ -35,6 +35,9 @@ class Track():
        robustPercent(int, optional): Resampling percent. Default is 20
        obsmodel(str, optional): Observation model. Default is 'HSV color-based'
        stateSpace(str, optional): State space model. Default is 'dynamic_bbox'
+       modelArgs(dict, optional): Keyword arguments of the observation model,
+           e.g. {"kernel": True, "gridSize": 16} for 'HSV color-based'. 
+           Default is None (default arguments of the model)
                   
     Supported PF algorithms:
         - 'SIS': Sequential Importance Sampling filter
@@ -60,7 +63,20 @@ class Track():
     
     Supported observation models: 
         - 'HSV color-based': Color model for weighing the particles  
+        - 'HSV integral histogram': Color model computed with integral 
+          histograms, suitable for large number of particles
+        - 'HSV back-projection': Color model scoring the particles with the 
+          back-projection of the reference histogram, suitable for very 
+          large number of particles
         - 'LBP-based': Texture model for weighing the particles
+        - 'LBP integral histogram': Texture model computed with integral
+          histograms of the frame LBP codes
+        - 'HOG-based': Gradient orientation model computed with integral 
+          histograms, robust to lighting changes
+        - 'Ellipse contour': Head contour model based on the image 
+          gradients on an ellipse
+        - 'Template correlation': Gray face template matched once per frame
+        - 'HSV+LBP fused': Color and texture models evaluated together
                   
     Supported state space models:
         - 'dynamic_bbox': Self updating bounding box model
@@ -111,7 +127,7 @@ class Track():
                  detector="CaffeModel", estimate="weighted_mean", 
                  resample="systematic", resamplePercent=50, 
                  robustPercent=20, obsmodel="HSV color-based", 
-                 stateSpace="dynamic_bbox"):                 
+                 stateSpace="dynamic_bbox", modelArgs=None):                 
         # handling input format error type
         if video != None:
             error_text = ("Path to the input video file should contain "
@@ -137,6 +153,7 @@ class Track():
         # Target model parameters
         self.obsmodel = obsmodel
         self.stateSpace = stateSpace
+        self.modelArgs = modelArgs
 
         
     def run(self, iterations=10, gt=None, errorFile=None, 
@@ -245,7 +262,8 @@ class Track():
                               estimate = self.estimate, resample = self.resample, 
                               resamplePercent = self.resamplePercent, 
                               robustPercent = self.robustPercent, 
-                              obsmodel = self.obsmodel, stateSpace = self.stateSpace)
+                              obsmodel = self.obsmodel, stateSpace = self.stateSpace,
+                              modelArgs = self.modelArgs)
         
         if gt != None:
             error_text = ("Path to the ground truth file should contain the "
@@ -85,9 +85,13 @@ setup(
                       'opencv-python == 4.2.0', 
                       'imutils',
                       'pyqt5', 
-                      'scikit-image', 
                       'dlib == 19.8.1', 
                       'filterpy == 1.4.5'],
+    
+    # Optional dependencies, e.g. pip install pftracker[numba] 
+    extras_require={
+        'numba': ['numba'],
+    },
 
     # If there are data files included in your packages that need to be
     # installed, specify them here.  If using Python 2.6 or less, then these
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the histogram normalization and distance metrics.
+
+@author: Bessie Domínguez-Dáger
+"""
+import numpy as np
+from pftracker.modules.models.histDistances import minmax_normalize, bhattacharyya
+
+# histogram whose minimum is not at bin 0, its float32 normalization
+# rounds the minimum bin slightly below 0
+HIST = np.array([[221.35838, 203.74342, 401.1467, 326.7293, 219.9009,
+                  386.1999, 224.39987, 222.6379, 66.35373, 167.75459,
+                  297.2608, 325.43738, 36.966454, 15.63503, 61.415588,
+                  257.15268]], dtype=np.float32)
+
+def test_minmax_normalize_range():
+    hists = minmax_normalize(HIST, alpha=0, beta=255)
+    
+    assert hists.min() == 0
+    assert hists.max() == 255
+    assert np.argmin(hists) == np.argmin(HIST)
+
+def test_bhattacharyya_finite():
+    hists = minmax_normalize(HIST, alpha=0, beta=255)
+    distances = bhattacharyya(hists[0], hists)
+    
+    assert np.all(np.isfinite(distances))
+    assert distances[0] < 1e-6
+
+def test_bhattacharyya_negative_bins():
+    hist_ref = np.array([1., 2., 3., 4.])
+    hists = np.array([[1., 2., 3., 4.], [1., 2., 3., -1e-6]])
+    distances = bhattacharyya(hist_ref, hists)
+    
+    assert np.all(np.isfinite(distances))
+    assert distances[0] < 1e-6
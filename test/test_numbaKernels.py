@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the compiled kernels of the observation models.
+
+@author: Bessie Domínguez-Dáger
+"""
+import numpy as np
+from pftracker.modules.models.numbaKernels import lbp_histograms, bhattacharyya_minmax
+from pftracker.modules.models.histDistances import minmax_normalize
+from pftracker.modules.models.lbp.lbpoperator import LBPOperator
+
+def test_lbp_histograms():
+    rng = np.random.default_rng(0)
+    gray = rng.integers(0, 256, (60, 80)).astype(np.uint8)
+    lbpOperator = LBPOperator(8, 8)
+    
+    # full and clipped bounding boxes
+    minX, minY = np.array([0, 10, 50, 70]), np.array([0, 5, 30, 55])
+    maxX, maxY = np.minimum(minX + 20, 80), np.minimum(minY + 20, 60)
+    hists = lbp_histograms(gray, minX, minY, maxX, maxY, lbpOperator, 10)
+    
+    for i in range(minX.size):
+        lbp = lbpOperator.compute(gray[minY[i]:maxY[i], minX[i]:maxX[i]])
+        assert np.array_equal(hists[i], np.bincount(lbp.ravel(), minlength=10))
+
+def test_bhattacharyya_minmax_finite():
+    # histogram whose float32 normalization rounds the minimum bin 
+    # slightly below 0
+    hists = np.array([[221.35838, 203.74342, 401.1467, 326.7293, 219.9009,
+                       386.1999, 224.39987, 222.6379, 66.35373, 167.75459,
+                       297.2608, 325.43738, 36.966454, 15.63503, 61.415588,
+                       257.15268]], dtype=np.float32)
+    hist_ref = minmax_normalize(hists)[0]
+    distances = bhattacharyya_minmax(hist_ref, hists, np.sqrt(hist_ref))
+    
+    assert np.all(np.isfinite(distances))
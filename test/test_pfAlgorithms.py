@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the log domain weight normalization of the particle filters.
+
+@author: Bessie Domínguez-Dáger
+"""
+import numpy as np
+from pftracker.modules.filter.pfAlgorithms import log_normalize
+
+def test_log_normalize():
+    log_w = np.log(np.array([[1., 2., 3., 4.]]))
+    
+    assert np.allclose(np.exp(log_normalize(log_w)), [[0.1, 0.2, 0.3, 0.4]])
+
+def test_log_normalize_nan():
+    # undefined weights are zero, the other ones keep their proportions
+    log_w = np.log(np.array([[1., 2., 3., 4.]]))
+    log_w[0, 1] = np.nan
+    w = np.exp(log_normalize(log_w))
+    
+    assert np.allclose(w, [[0.125, 0., 0.375, 0.5]])
+
+def test_log_normalize_all_zero():
+    log_w = np.full((1, 4), -np.inf)
+    
+    assert np.allclose(np.exp(log_normalize(log_w)), 0.25)
+    
+def test_log_normalize_all_nan():
+    log_w = np.full((1, 4), np.nan)
+    
+    assert np.allclose(np.exp(log_normalize(log_w)), 0.25)
+
+def test_log_normalize_inf():
+    log_w = np.array([[0., np.inf, -np.inf, np.inf]])
+    
+    assert np.allclose(np.exp(log_normalize(log_w)), [[0., 0.5, 0., 0.5]])